@@ -0,0 +1,257 @@
+"""Cost of each step protected routes run before the handler: token creation
+and decoding, the blocklist check, the bearer dependency, role checks and
+bcrypt verification
+
+    python -m benchmarks.auth [--min-time 0.2] [--rounds 7] [--only decode]
+        [--output results.json] [--baseline earlier.json]
+
+Redis is replaced by fakeredis, which must be installed. Every op reports the
+median time per call, peak traced memory per call and blocks still allocated
+afterwards per call, so a cache that grows without bound shows up. Timings are
+taken with tracemalloc off, it slows allocation heavy code several times.
+"""
+
+from benchmarks import git_commit
+from datetime import datetime
+from fastapi import Request
+from src.auth.dependencies import (
+    AccessTokenBearer,
+    RoleChecker,
+    get_token_user,
+)
+from src.auth.utils import (
+    create_access_token,
+    decode_token,
+    password_context,
+    password_hasher,
+    token_cache,
+    verify_password,
+)
+from src.db import redis as blocklist
+from src.db.models import User
+import argparse
+import asyncio
+import fakeredis
+import json
+import statistics
+import time
+import tracemalloc
+import uuid
+
+PASSWORD = "benchmark"
+
+
+def make_user() -> User:
+    now = datetime.now()
+
+    return User(
+        uid=uuid.uuid4(),
+        username="bench",
+        email="bench@example.com",
+        firstname="Bench",
+        lastname="User",
+        role="user",
+        is_verified=True,
+        password_hash="",
+        created_at=now,
+        updated_at=now,
+    )
+
+
+def make_request(token: str) -> Request:
+    # a fresh request each call, the bearer caches the decoded token on its state
+    return Request(
+        {
+            "type": "http",
+            "method": "GET",
+            "path": "/api/v1/books/",
+            "query_string": b"",
+            "headers": [(b"authorization", f"Bearer {token}".encode())],
+        }
+    )
+
+
+def build_ops() -> dict:
+    """op name -> zero argument function or coroutine function running it once"""
+    user = make_user()
+    claims = {
+        "email": user.email,
+        "user_uid": str(user.uid),
+        "role": user.role,
+        "is_verified": user.is_verified,
+        "token_version": 0,
+    }
+    token = create_access_token(user_data=claims)
+    token_data = decode_token(token)
+    password_hash = password_context.hash(PASSWORD)
+    bearer = AccessTokenBearer()
+    role_checker = RoleChecker(["admin", "user"])
+
+    def decode_uncached():
+        token_cache.clear()
+        return decode_token(token)
+
+    async def blocklist_redis():
+        blocklist.blocklist_mirror.warm = False
+        return await blocklist.token_in_blocklist(token_data["jti"])
+
+    async def blocklist_mirror():
+        blocklist.blocklist_mirror.warm = True
+        return await blocklist.token_in_blocklist(token_data["jti"])
+
+    async def bearer_call():
+        blocklist.blocklist_mirror.warm = True
+        return await bearer(make_request(token))
+
+    async def token_user():
+        return await get_token_user(token_data, session=None)
+
+    async def hasher_verify():
+        return await password_hasher.verify(PASSWORD, password_hash)
+
+    return {
+        "create_access_token": lambda: create_access_token(user_data=claims),
+        "decode_token uncached": decode_uncached,
+        "decode_token cached": lambda: decode_token(token),
+        "token_in_blocklist redis": blocklist_redis,
+        "token_in_blocklist mirror": blocklist_mirror,
+        "AccessTokenBearer()": bearer_call,
+        "get_token_user": token_user,
+        "RoleChecker()": lambda: role_checker(user),
+        f"verify_password {password_hash[:7]}": lambda: verify_password(
+            PASSWORD, password_hash
+        ),
+        "password_hasher.verify": hasher_verify,
+    }
+
+
+def repeater(loop: asyncio.AbstractEventLoop, fn):
+    """Returns run(number) calling fn number times, coroutines are awaited in
+    one task so the event loop round trip is not part of the op"""
+    if asyncio.iscoroutinefunction(fn):
+
+        async def batch(number: int) -> None:
+            for _ in range(number):
+                await fn()
+
+        return lambda number: loop.run_until_complete(batch(number))
+
+    def run(number: int) -> None:
+        for _ in range(number):
+            fn()
+
+    return run
+
+
+def calibrate(run, min_time: float) -> int:
+    """Calls per round so that a round takes at least min_time"""
+    number = 1
+
+    while True:
+        start = time.perf_counter()
+        run(number)
+        if time.perf_counter() - start >= min_time:
+            return number
+        number *= 2
+
+
+def measure(run, min_time: float, rounds: int) -> dict:
+    run(1)
+    number = calibrate(run, min_time)
+    timings = []
+
+    for _ in range(rounds):
+        start = time.perf_counter()
+        run(number)
+        timings.append((time.perf_counter() - start) / number)
+
+    tracemalloc.start()
+    try:
+        run(1)
+        tracemalloc.reset_peak()
+        base, _ = tracemalloc.get_traced_memory()
+        run(1)
+        _, peak = tracemalloc.get_traced_memory()
+
+        before = tracemalloc.take_snapshot()
+        run(number)
+        after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+
+    retained = sum(stat.count_diff for stat in after.compare_to(before, "filename"))
+
+    # median, a gc pause in one round should not move the result
+    return {
+        "us_per_op": statistics.median(timings) * 1_000_000,
+        "peak_bytes_per_op": peak - base,
+        "retained_blocks_per_op": retained / number,
+        "calls_per_round": number,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--min-time", type=float, default=0.2)
+    parser.add_argument("--rounds", type=int, default=7)
+    parser.add_argument("--only", help="run the ops whose name contains this")
+    parser.add_argument("--output", help="write the results as json")
+    parser.add_argument("--baseline", help="results json of an earlier run")
+    args = parser.parse_args()
+
+    blocklist.token_block_list = fakeredis.FakeAsyncRedis()
+    blocklist.blocklist_mirror.redis = blocklist.token_block_list
+    # a running mirror is only consulted while warm, the ops toggle that
+    blocklist.blocklist_mirror._task = object()
+
+    loop = asyncio.new_event_loop()
+    ops = build_ops()
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["ops"]
+
+    print(
+        f"{'op':<30} {'us/op':>10} {'ops/s':>10} {'peak B/op':>10} "
+        f"{'kept/op':>8} {'change':>8}"
+    )
+    results = {}
+
+    try:
+        for name, fn in ops.items():
+            if args.only and args.only not in name:
+                continue
+
+            row = measure(repeater(loop, fn), args.min_time, args.rounds)
+            results[name] = row
+
+            change = ""
+            if name in baseline:
+                ratio = row["us_per_op"] / baseline[name]["us_per_op"]
+                change = f"{(ratio - 1) * 100:+.1f}%"
+            print(
+                f"{name:<30} {row['us_per_op']:>10.2f} "
+                f"{1_000_000 / row['us_per_op']:>10.0f} "
+                f"{row['peak_bytes_per_op']:>10} "
+                f"{row['retained_blocks_per_op']:>8.2f} {change:>8}"
+            )
+    finally:
+        blocklist.blocklist_mirror._task = None
+        password_hasher.shutdown()
+        loop.close()
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(
+                {
+                    "commit": git_commit(),
+                    "timestamp": datetime.now().isoformat(timespec="seconds"),
+                    "ops": results,
+                },
+                f,
+                indent=2,
+            )
+
+
+if __name__ == "__main__":
+    main()
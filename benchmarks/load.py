@@ -0,0 +1,449 @@
+"""Throughput, latency percentiles and SQL statements per request for a
+weighted mix of routes driven by concurrent async clients
+
+    python -m benchmarks.load [--concurrency 32] [--duration 30] [--warmup 5]
+        [--mix list_books=40,book_detail=30,login=5,add_review=15,add_tags=10]
+        [--users 20] [--books 2000] [--reviews 5000] [--tags 50]
+        [--url http://127.0.0.1:8000] [--fake-redis] [--output results.json]
+        [--baseline earlier.json]
+
+The dataset is seeded into DATABASE_URL before the run and deleted after it.
+Without --url the app runs in-process over httpx's ASGI transport and shares
+the event loop with the clients; with --url the load goes to a server started
+from the same .env. SQL statements per request are read from the
+/metrics histograms, so they cover every worker of a multiprocess server.
+--output writes the results with the git commit, --baseline prints the change
+against such a file.
+
+Rate limiting and access logging are off unless set in the environment.
+"""
+
+import os
+
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+os.environ.setdefault("ACCESS_LOG_SAMPLE_RATE", "0")
+
+from datetime import date, datetime, timedelta
+from prometheus_client.parser import text_string_to_metric_families
+from benchmarks import git_commit
+from sqlalchemy import delete, insert, select
+from src import app
+from src.auth.service import UserService
+from src.auth.utils import create_access_token, generate_password_hash
+from src.db import redis as blocklist
+from src.db.main import async_engine
+from src.db.models import Book, BookTag, Review, Tag, User
+import argparse
+import asyncio
+import contextlib
+import httpx
+import json
+import random
+import statistics
+import time
+import uuid
+
+PASSWORD = "benchmark"
+LANGUAGES = ["en", "fr", "de", "es"]
+PUBLISHERS = ["Penguin", "Picador", "Gallimard", "Vintage", "Minuit"]
+
+
+class Dataset:
+    """Rows seeded for one run, every name and email starts with the prefix"""
+
+    def __init__(self, prefix: str) -> None:
+        self.prefix = prefix
+        self.users: list[User] = []
+        self.tokens: list[str] = []
+        self.books: list[uuid.UUID] = []
+        self.tag_names: list[str] = []
+
+
+async def seed(args, dataset: Dataset) -> None:
+    rng = random.Random(args.seed)
+    password_hash = generate_password_hash(PASSWORD)
+    now = datetime.now()
+
+    users = [
+        dict(
+            uid=uuid.uuid4(),
+            username=f"{dataset.prefix}-user{i}",
+            email=f"{dataset.prefix}-user{i}@example.com",
+            firstname="Bench",
+            lastname="User",
+            role="user",
+            is_verified=True,
+            password_hash=password_hash,
+            created_at=now,
+            updated_at=now,
+        )
+        for i in range(args.users)
+    ]
+    tags = [
+        dict(uid=uuid.uuid4(), name=f"{dataset.prefix}-tag{i}", created_at=now)
+        for i in range(args.tags)
+    ]
+    books = [
+        dict(
+            uid=uuid.uuid4(),
+            title=f"{dataset.prefix} book {i}",
+            author=f"Author {i % 500}",
+            publisher=rng.choice(PUBLISHERS),
+            published_date=date(2000, 1, 1) + timedelta(days=i % 9000),
+            page_count=rng.randint(80, 900),
+            language=rng.choice(LANGUAGES),
+            user_uid=rng.choice(users)["uid"],
+            created_at=now - timedelta(seconds=i),
+            updated_at=now,
+            review_count=0,
+            rating_sum=0,
+            rating_avg=0,
+            rating_histogram={},
+        )
+        for i in range(args.books)
+    ]
+
+    reviews = []
+    for _ in range(args.reviews):
+        book = rng.choice(books)
+        rating = rng.randint(0, 4)
+        reviews.append(
+            dict(
+                uid=uuid.uuid4(),
+                rating=rating,
+                review_text="seeded review",
+                user_uid=rng.choice(users)["uid"],
+                book_uid=book["uid"],
+                created_at=now,
+                updated_at=now,
+            )
+        )
+        # the aggregates ReviewService keeps on the book
+        book["review_count"] += 1
+        book["rating_sum"] += rating
+        book["rating_avg"] = book["rating_sum"] / book["review_count"]
+        histogram = book["rating_histogram"]
+        histogram[str(rating)] = histogram.get(str(rating), 0) + 1
+
+    book_tags = [
+        dict(book_id=book["uid"], tag_id=tag["uid"])
+        for book in books
+        for tag in rng.sample(tags, min(len(tags), 3))
+    ]
+
+    async with async_engine.begin() as conn:
+        for model, rows in (
+            (User, users),
+            (Tag, tags),
+            (Book, books),
+            (Review, reviews),
+            (BookTag, book_tags),
+        ):
+            if rows:
+                await conn.execute(insert(model.__table__), rows)
+
+    user_service = UserService()
+    dataset.users = [User(**row) for row in users]
+    dataset.tokens = [
+        create_access_token(user_data=await user_service.get_token_claims(user))
+        for user in dataset.users
+    ]
+    dataset.books = [book["uid"] for book in books]
+    dataset.tag_names = [tag["name"] for tag in tags]
+
+
+async def cleanup(dataset: Dataset) -> None:
+    """Delete seeded rows and everything the run created on top of them"""
+    users = select(User.uid).where(User.email.like(f"{dataset.prefix}-%"))
+    books = select(Book.uid).where(Book.user_uid.in_(users))
+
+    async with async_engine.begin() as conn:
+        await conn.execute(
+            delete(Review).where(
+                Review.book_uid.in_(books) | Review.user_uid.in_(users)
+            )
+        )
+        await conn.execute(delete(BookTag).where(BookTag.book_id.in_(books)))
+        await conn.execute(delete(Book).where(Book.user_uid.in_(users)))
+        await conn.execute(delete(Tag).where(Tag.name.like(f"{dataset.prefix}-%")))
+        await conn.execute(delete(User).where(User.email.like(f"{dataset.prefix}-%")))
+
+
+def auth(dataset: Dataset, rng: random.Random) -> dict:
+    return {"Authorization": f"Bearer {rng.choice(dataset.tokens)}"}
+
+
+async def list_books(client, dataset, rng):
+    params = {"limit": 20}
+    if rng.random() < 0.3:
+        params["language"] = rng.choice(LANGUAGES)
+    return await client.get("/api/v1/books/", params=params, headers=auth(dataset, rng))
+
+
+async def book_detail(client, dataset, rng):
+    return await client.get(
+        f"/api/v1/books/{rng.choice(dataset.books)}", headers=auth(dataset, rng)
+    )
+
+
+async def login(client, dataset, rng):
+    return await client.post(
+        "/api/v1/auth/login",
+        json={"email": rng.choice(dataset.users).email, "password": PASSWORD},
+    )
+
+
+async def add_review(client, dataset, rng):
+    return await client.post(
+        f"/api/v1/reviews/book/{rng.choice(dataset.books)}",
+        json={"rating": rng.randint(0, 4), "review_text": "load test"},
+        headers=auth(dataset, rng),
+    )
+
+
+async def add_tags(client, dataset, rng):
+    names = rng.sample(dataset.tag_names, min(len(dataset.tag_names), 2))
+    return await client.post(
+        f"/api/v1/tags/book/{rng.choice(dataset.books)}/tags",
+        json={"tags": [{"name": name} for name in names]},
+        headers=auth(dataset, rng),
+    )
+
+
+# scenario name -> (request, route template it is reported under in /metrics)
+SCENARIOS = {
+    "list_books": (list_books, "/api/v1/books/"),
+    "book_detail": (book_detail, "/api/v1/books/{book_uid}"),
+    "login": (login, "/api/v1/auth/login"),
+    "add_review": (add_review, "/api/v1/reviews/book/{book_uid}"),
+    "add_tags": (add_tags, "/api/v1/tags/book/{book_uid}/tags"),
+}
+
+
+def parse_mix(mix: str) -> dict[str, int]:
+    weights = {}
+    for item in mix.split(","):
+        name, _, weight = item.partition("=")
+        if name not in SCENARIOS:
+            raise SystemExit(f"unknown scenario {name!r}, pick from {list(SCENARIOS)}")
+        weights[name] = int(weight)
+    return weights
+
+
+async def queries_per_route(client) -> dict[str, tuple[float, float]]:
+    """(sum, count) of bookly_db_queries_per_request by route"""
+    response = await client.get("/metrics")
+    totals = {}
+
+    for family in text_string_to_metric_families(response.text):
+        if family.name != "bookly_db_queries_per_request":
+            continue
+        for sample in family.samples:
+            route = sample.labels["route"]
+            total, count = totals.get(route, (0.0, 0.0))
+            if sample.name.endswith("_sum"):
+                total = sample.value
+            elif sample.name.endswith("_count"):
+                count = sample.value
+            totals[route] = (total, count)
+
+    return totals
+
+
+async def worker(client, dataset, weights, deadline, timings, errors, seed):
+    rng = random.Random(seed)
+    names = list(weights)
+    scenario_weights = list(weights.values())
+
+    while time.perf_counter() < deadline:
+        name = rng.choices(names, scenario_weights)[0]
+        request, _ = SCENARIOS[name]
+        start = time.perf_counter()
+
+        try:
+            response = await request(client, dataset, rng)
+            failed = response.status_code >= 400
+        except httpx.HTTPError:
+            failed = True
+
+        timings[name].append(time.perf_counter() - start)
+        errors[name] += failed
+
+
+async def drive(client, dataset, weights, args, seconds: float, seed: int):
+    timings = {name: [] for name in weights}
+    errors = {name: 0 for name in weights}
+    deadline = time.perf_counter() + seconds
+
+    await asyncio.gather(
+        *(
+            worker(client, dataset, weights, deadline, timings, errors, seed + i)
+            for i in range(args.concurrency)
+        )
+    )
+
+    return timings, errors
+
+
+def summarize(timings: list[float], errors: int, seconds: float) -> dict:
+    if not timings:
+        return {"requests": 0, "errors": errors, "rps": 0.0}
+
+    ms = sorted(t * 1000 for t in timings)
+    cuts = (
+        statistics.quantiles(ms, n=100, method="inclusive") if len(ms) > 1 else ms * 99
+    )
+
+    return {
+        "requests": len(ms),
+        "errors": errors,
+        "rps": len(ms) / seconds,
+        "p50_ms": cuts[49],
+        "p90_ms": cuts[89],
+        "p99_ms": cuts[98],
+        "max_ms": ms[-1],
+    }
+
+
+def print_report(results: dict) -> None:
+    print(
+        f"{'scenario':<12} {'requests':>8} {'errors':>6} {'rps':>8} "
+        f"{'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} {'max ms':>8} {'sql/req':>7}"
+    )
+    for name, row in [*results["scenarios"].items(), ("total", results["total"])]:
+        if not row["requests"]:
+            print(f"{name:<12} {0:>8}")
+            continue
+        queries = row.get("db_queries_per_request")
+        print(
+            f"{name:<12} {row['requests']:>8} {row['errors']:>6} {row['rps']:>8.1f} "
+            f"{row['p50_ms']:>8.2f} {row['p90_ms']:>8.2f} {row['p99_ms']:>8.2f} "
+            f"{row['max_ms']:>8.2f} "
+            f"{'' if queries is None else format(queries, '.2f'):>7}"
+        )
+
+
+def print_comparison(baseline: dict, results: dict) -> None:
+    print(f"\nagainst {baseline['commit'] or 'baseline'}, rps and p99 change:")
+    for name, row in results["scenarios"].items():
+        before = baseline["scenarios"].get(name)
+        if not before or not before["requests"] or not row["requests"]:
+            continue
+        rps = (row["rps"] / before["rps"] - 1) * 100
+        p99 = (row["p99_ms"] / before["p99_ms"] - 1) * 100
+        print(f"{name:<12} rps {rps:+7.1f}%   p99 {p99:+7.1f}%")
+
+
+async def run(args) -> dict:
+    weights = parse_mix(args.mix)
+
+    if args.fake_redis:
+        # not a dependency of the app, only needed for this mode
+        import fakeredis
+
+        blocklist.token_block_list = fakeredis.FakeAsyncRedis()
+        blocklist.blocklist_mirror.redis = blocklist.token_block_list
+
+    dataset = Dataset(f"bench-{uuid.uuid4().hex[:8]}")
+    await seed(args, dataset)
+
+    async with contextlib.AsyncExitStack() as stack:
+        stack.push_async_callback(async_engine.dispose)
+        stack.push_async_callback(cleanup, dataset)
+
+        if args.url:
+            client = httpx.AsyncClient(
+                base_url=args.url,
+                limits=httpx.Limits(max_connections=args.concurrency),
+                timeout=30,
+            )
+        else:
+            await stack.enter_async_context(app.router.lifespan_context(app))
+            client = httpx.AsyncClient(
+                transport=httpx.ASGITransport(app=app), base_url="http://bench"
+            )
+        await stack.enter_async_context(client)
+
+        if args.warmup:
+            await drive(client, dataset, weights, args, args.warmup, args.seed)
+
+        before = await queries_per_route(client)
+        start = time.perf_counter()
+        timings, errors = await drive(
+            client, dataset, weights, args, args.duration, args.seed + args.concurrency
+        )
+        seconds = time.perf_counter() - start
+        after = await queries_per_route(client)
+
+    scenarios = {}
+    for name in weights:
+        row = summarize(timings[name], errors[name], seconds)
+        route = SCENARIOS[name][1]
+        total, count = after.get(route, (0.0, 0.0))
+        prev_total, prev_count = before.get(route, (0.0, 0.0))
+        if count > prev_count:
+            row["db_queries_per_request"] = (total - prev_total) / (count - prev_count)
+        scenarios[name] = row
+
+    return {
+        "commit": git_commit(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "target": args.url or "in-process",
+        "config": {
+            "concurrency": args.concurrency,
+            "duration": args.duration,
+            "warmup": args.warmup,
+            "mix": weights,
+            "users": args.users,
+            "books": args.books,
+            "reviews": args.reviews,
+            "tags": args.tags,
+            "fake_redis": args.fake_redis,
+            "seed": args.seed,
+        },
+        "scenarios": scenarios,
+        "total": summarize(
+            [t for name in weights for t in timings[name]],
+            sum(errors.values()),
+            seconds,
+        ),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", help="load a running server instead of the app")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--warmup", type=float, default=5)
+    parser.add_argument(
+        "--mix",
+        default="list_books=40,book_detail=30,login=5,add_review=15,add_tags=10",
+    )
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--books", type=int, default=2000)
+    parser.add_argument("--reviews", type=int, default=5000)
+    parser.add_argument("--tags", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--fake-redis", action="store_true")
+    parser.add_argument("--output", help="write the results as json")
+    parser.add_argument("--baseline", help="results json of an earlier run")
+    args = parser.parse_args()
+
+    if args.fake_redis and args.url:
+        parser.error("--fake-redis only applies to the in-process app")
+
+    results = asyncio.run(run(args))
+    print_report(results)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            print_comparison(json.load(f), results)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""Serialization time of a books page, FastAPI's response_model path against
+the cached TypeAdapters in src/responses.py
+
+    python -m benchmarks.serialization [--books 1000] [--rounds 50]
+
+Imports the app, so the settings in .env must be present.
+"""
+
+from datetime import date, datetime
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, ORJSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+from src.books.schema import BookPage, book_page_adapter
+from src.db.models import Book, Tag
+from src.responses import model_response
+import argparse
+import asyncio
+import statistics
+import time
+import uuid
+
+
+def make_books(count: int) -> list[Book]:
+    now = datetime.now()
+    tags = [Tag(uid=uuid.uuid4(), name=f"tag {i}", created_at=now) for i in range(5)]
+    books = []
+
+    for i in range(count):
+        book = Book(
+            uid=uuid.uuid4(),
+            title=f"Book {i}",
+            author="Author",
+            publisher="Publisher",
+            published_date=date(2020, 1, 1),
+            page_count=300,
+            language="en",
+            created_at=now,
+            updated_at=now,
+            review_count=3,
+            rating_avg=3.5,
+        )
+        book.tags = tags[: i % 3]
+        books.append(book)
+
+    return books
+
+
+async def fastapi_path(field, page: dict, response_class) -> bytes:
+    content = await serialize_response(field=field, response_content=page)
+
+    return response_class(content).body
+
+
+def measure(label: str, fn, rounds: int, count: int) -> float:
+    fn()
+    timings = []
+
+    for _ in range(rounds):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+
+    # median, a gc pause in one round should not move the result
+    per_1k = statistics.median(timings) / count * 1000 * 1000
+    print(f"{label:<40} {per_1k:8.2f} ms per 1k books")
+
+    return per_1k
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--books", type=int, default=1000)
+    parser.add_argument("--rounds", type=int, default=50)
+    args = parser.parse_args()
+
+    page = {"books": make_books(args.books), "next_cursor": None}
+    field = create_model_field("Response_books", BookPage, mode="serialization")
+    loop = asyncio.new_event_loop()
+
+    before = measure(
+        "response_model + JSONResponse",
+        lambda: loop.run_until_complete(fastapi_path(field, page, JSONResponse)),
+        args.rounds,
+        args.books,
+    )
+    measure(
+        "response_model + ORJSONResponse",
+        lambda: loop.run_until_complete(fastapi_path(field, page, ORJSONResponse)),
+        args.rounds,
+        args.books,
+    )
+    measure(
+        "jsonable_encoder, no response_model",
+        lambda: JSONResponse(jsonable_encoder(page)).body,
+        args.rounds,
+        args.books,
+    )
+    after = measure(
+        "TypeAdapter.dump_json (model_response)",
+        lambda: model_response(book_page_adapter, page).body,
+        args.rounds,
+        args.books,
+    )
+
+    print(f"speedup {before / after:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+"""books keyset pagination indexes
+
+Revision ID: 3b1f6c9d2a47
+Revises: 811702c3cdb8
+Create Date: 2026-10-18 09:12:31.402118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "3b1f6c9d2a47"
+down_revision: Union[str, None] = "811702c3cdb8"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(
+        "ix_books_created_at_uid", "books", ["created_at", "uid"], unique=False
+    )
+    op.create_index(
+        "ix_books_user_uid_created_at_uid",
+        "books",
+        ["user_uid", "created_at", "uid"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_books_user_uid_created_at_uid", table_name="books")
+    op.drop_index("ix_books_created_at_uid", table_name="books")
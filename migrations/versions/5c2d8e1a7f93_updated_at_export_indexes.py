@@ -0,0 +1,30 @@
+"""updated_at export indexes
+
+Revision ID: 5c2d8e1a7f93
+Revises: 3b1f6c9d2a47
+Create Date: 2026-10-18 11:03:52.118734
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "5c2d8e1a7f93"
+down_revision: Union[str, None] = "3b1f6c9d2a47"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index("ix_books_updated_at", "books", ["updated_at"], unique=False)
+    op.create_index("ix_reviews_updated_at", "reviews", ["updated_at"], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_reviews_updated_at", table_name="reviews")
+    op.drop_index("ix_books_updated_at", table_name="books")
@@ -0,0 +1,59 @@
+"""unique tag names
+
+Revision ID: 7e4a0b6c3d15
+Revises: 5c2d8e1a7f93
+Create Date: 2026-10-18 12:26:07.551903
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "7e4a0b6c3d15"
+down_revision: Union[str, None] = "5c2d8e1a7f93"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# oldest tag of each name survives, duplicates are merged into it
+DUPLICATE_TAGS = """
+    SELECT uid, first_value(uid) OVER (
+        PARTITION BY name ORDER BY created_at, uid
+    ) AS keep_uid
+    FROM tags
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute(
+        f"""
+        INSERT INTO booktag (book_id, tag_id)
+        SELECT booktag.book_id, duplicates.keep_uid
+        FROM booktag JOIN ({DUPLICATE_TAGS}) AS duplicates
+            ON duplicates.uid = booktag.tag_id
+        WHERE duplicates.uid <> duplicates.keep_uid
+        ON CONFLICT DO NOTHING
+        """
+    )
+    op.execute(
+        f"""
+        DELETE FROM booktag USING ({DUPLICATE_TAGS}) AS duplicates
+        WHERE duplicates.uid = booktag.tag_id
+            AND duplicates.uid <> duplicates.keep_uid
+        """
+    )
+    op.execute(
+        f"""
+        DELETE FROM tags USING ({DUPLICATE_TAGS}) AS duplicates
+        WHERE duplicates.uid = tags.uid AND duplicates.uid <> duplicates.keep_uid
+        """
+    )
+    op.create_index("ix_tags_name", "tags", ["name"], unique=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_tags_name", table_name="tags")
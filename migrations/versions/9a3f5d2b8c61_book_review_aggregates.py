@@ -0,0 +1,87 @@
+"""book review aggregates
+
+Revision ID: 9a3f5d2b8c61
+Revises: 7e4a0b6c3d15
+Create Date: 2026-10-18 13:48:44.306512
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = "9a3f5d2b8c61"
+down_revision: Union[str, None] = "7e4a0b6c3d15"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        "books",
+        sa.Column("review_count", sa.INTEGER(), server_default="0", nullable=False),
+    )
+    op.add_column(
+        "books",
+        sa.Column("rating_sum", sa.INTEGER(), server_default="0", nullable=False),
+    )
+    op.add_column(
+        "books",
+        sa.Column(
+            "rating_avg",
+            postgresql.DOUBLE_PRECISION(),
+            server_default="0",
+            nullable=False,
+        ),
+    )
+    op.add_column(
+        "books",
+        sa.Column(
+            "rating_histogram",
+            postgresql.JSONB(astext_type=sa.Text()),
+            server_default="{}",
+            nullable=False,
+        ),
+    )
+    op.create_index(
+        "ix_books_rating_avg_uid", "books", ["rating_avg", "uid"], unique=False
+    )
+
+    # backfill from the reviews written so far
+    op.execute(
+        """
+        UPDATE books
+        SET review_count = totals.review_count,
+            rating_sum = totals.rating_sum,
+            rating_avg = totals.rating_sum::float / totals.review_count,
+            rating_histogram = totals.rating_histogram
+        FROM (
+            SELECT book_uid,
+                sum(reviews)::int AS review_count,
+                sum(rating * reviews)::int AS rating_sum,
+                jsonb_object_agg(rating::text, reviews) AS rating_histogram
+            FROM (
+                SELECT book_uid, rating, count(*) AS reviews
+                FROM reviews
+                WHERE book_uid IS NOT NULL
+                GROUP BY book_uid, rating
+            ) AS per_rating
+            GROUP BY book_uid
+        ) AS totals
+        WHERE books.uid = totals.book_uid
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_books_rating_avg_uid", table_name="books")
+    op.drop_column("books", "rating_histogram")
+    op.drop_column("books", "rating_avg")
+    op.drop_column("books", "rating_sum")
+    op.drop_column("books", "review_count")
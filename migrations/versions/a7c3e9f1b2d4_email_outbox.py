@@ -0,0 +1,46 @@
+"""email outbox
+
+Revision ID: a7c3e9f1b2d4
+Revises: f4a6d8b2c9e3
+Create Date: 2026-10-18 19:10:04.518302
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = "a7c3e9f1b2d4"
+down_revision: Union[str, None] = "f4a6d8b2c9e3"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "email_outbox",
+        sa.Column("uid", postgresql.UUID(), nullable=False),
+        sa.Column("recipients", postgresql.ARRAY(postgresql.VARCHAR()), nullable=False),
+        sa.Column("subject", sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column("body", sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column("attempts", sa.Integer(), nullable=False),
+        sa.Column("last_error", sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+        sa.Column("available_at", postgresql.TIMESTAMP(), nullable=False),
+        sa.Column("created_at", postgresql.TIMESTAMP(), nullable=True),
+        sa.PrimaryKeyConstraint("uid"),
+    )
+    op.create_index(
+        "ix_email_outbox_available_at", "email_outbox", ["available_at"], unique=False
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_email_outbox_available_at", table_name="email_outbox")
+    op.drop_table("email_outbox")
@@ -0,0 +1,89 @@
+"""books full text search
+
+Revision ID: b6e1c4f0a2d8
+Revises: 9a3f5d2b8c61
+Create Date: 2026-10-18 15:02:19.874420
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = "b6e1c4f0a2d8"
+down_revision: Union[str, None] = "9a3f5d2b8c61"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# keep in sync with SEARCH_CONFIGS in src/books/utils.py
+SEARCH_CONFIGS = {
+    "da": "danish",
+    "de": "german",
+    "en": "english",
+    "es": "spanish",
+    "fi": "finnish",
+    "fr": "french",
+    "hu": "hungarian",
+    "it": "italian",
+    "nl": "dutch",
+    "no": "norwegian",
+    "pt": "portuguese",
+    "ro": "romanian",
+    "ru": "russian",
+    "sv": "swedish",
+    "tr": "turkish",
+}
+
+SEARCH_VECTOR = (
+    "setweight(to_tsvector(books_search_config(language), "
+    "coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector(books_search_config(language), "
+    "coalesce(author, '')), 'B') || "
+    "setweight(to_tsvector(books_search_config(language), "
+    "coalesce(publisher, '')), 'C')"
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    cases = "\n".join(
+        f"WHEN '{code}' THEN '{config}' WHEN '{config}' THEN '{config}'"
+        for code, config in SEARCH_CONFIGS.items()
+    )
+    op.execute(
+        f"""
+        CREATE OR REPLACE FUNCTION books_search_config(language text)
+        RETURNS regconfig
+        LANGUAGE sql IMMUTABLE PARALLEL SAFE
+        AS $$
+            SELECT (CASE lower(language) {cases} ELSE 'simple' END)::regconfig
+        $$
+        """
+    )
+    op.add_column(
+        "books",
+        sa.Column(
+            "search_vector",
+            postgresql.TSVECTOR(),
+            sa.Computed(SEARCH_VECTOR, persisted=True),
+            nullable=True,
+        ),
+    )
+    op.create_index(
+        "ix_books_search_vector",
+        "books",
+        ["search_vector"],
+        unique=False,
+        postgresql_using="gin",
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_books_search_vector", table_name="books", postgresql_using="gin")
+    op.drop_column("books", "search_vector")
+    op.execute("DROP FUNCTION books_search_config(text)")
@@ -0,0 +1,56 @@
+"""autocomplete trigram indexes
+
+Revision ID: d2f7a9c4e1b5
+Revises: b6e1c4f0a2d8
+Create Date: 2026-10-18 16:11:42.306518
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "d2f7a9c4e1b5"
+down_revision: Union[str, None] = "b6e1c4f0a2d8"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.create_index(
+        "ix_books_title_trgm",
+        "books",
+        ["title"],
+        unique=False,
+        postgresql_using="gin",
+        postgresql_ops={"title": "gin_trgm_ops"},
+    )
+    op.create_index(
+        "ix_books_author_trgm",
+        "books",
+        ["author"],
+        unique=False,
+        postgresql_using="gin",
+        postgresql_ops={"author": "gin_trgm_ops"},
+    )
+    op.create_index(
+        "ix_tags_name_trgm",
+        "tags",
+        ["name"],
+        unique=False,
+        postgresql_using="gin",
+        postgresql_ops={"name": "gin_trgm_ops"},
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_tags_name_trgm", table_name="tags", postgresql_using="gin")
+    op.drop_index("ix_books_author_trgm", table_name="books", postgresql_using="gin")
+    op.drop_index("ix_books_title_trgm", table_name="books", postgresql_using="gin")
+    # pg_trgm may be used by other objects, leave the extension installed
@@ -0,0 +1,38 @@
+"""books facet filter indexes
+
+Revision ID: e8b3c5a1f0d7
+Revises: d2f7a9c4e1b5
+Create Date: 2026-10-18 17:24:08.551902
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "e8b3c5a1f0d7"
+down_revision: Union[str, None] = "d2f7a9c4e1b5"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(
+        "ix_booktag_tag_id_book_id",
+        "booktag",
+        ["tag_id", "book_id"],
+        unique=False,
+    )
+    op.create_index("ix_books_language", "books", ["language"], unique=False)
+    op.create_index("ix_books_publisher", "books", ["publisher"], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_books_publisher", table_name="books")
+    op.drop_index("ix_books_language", table_name="books")
+    op.drop_index("ix_booktag_tag_id_book_id", table_name="booktag")
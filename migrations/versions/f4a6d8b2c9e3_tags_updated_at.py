@@ -0,0 +1,33 @@
+"""tags updated_at
+
+Revision ID: f4a6d8b2c9e3
+Revises: e8b3c5a1f0d7
+Create Date: 2026-10-18 18:02:37.920615
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = "f4a6d8b2c9e3"
+down_revision: Union[str, None] = "e8b3c5a1f0d7"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        "tags", sa.Column("updated_at", postgresql.TIMESTAMP(), nullable=True)
+    )
+    op.execute("UPDATE tags SET updated_at = created_at")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column("tags", "updated_at")
@@ -1,10 +1,18 @@
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse, Response
 from src.books.routes import book_router
 from src.auth.routes import auth_router
 from src.reviews.routes import review_router
 from src.tags.routes import tags_router
+from src.autocomplete.routes import autocomplete_router
+from src.autocomplete.service import autocomplete
 from contextlib import asynccontextmanager
 from src.db.main import init_db
+from src.db.redis import blocklist_mirror
+from src.auth.utils import password_hasher
+from src.access_log import access_log
+from src.outbox import outbox_dispatcher
+from src.metrics import render_metrics
 from .errors import register_all_errors
 from .middleware import register_middleware
 
@@ -12,10 +20,17 @@ from .middleware import register_middleware
 @asynccontextmanager
 async def life_span(app: FastAPI):
     print(f"serve is starting....")
-    from src.db.models import Book
-
-    await init_db()
+    access_log.start()
+    # tables are managed by alembic, init_db is only needed for a scratch db
+    await blocklist_mirror.start()
+    await autocomplete.start()
+    await outbox_dispatcher.start()
     yield
+    await outbox_dispatcher.stop()
+    await autocomplete.stop()
+    await blocklist_mirror.stop()
+    password_hasher.shutdown()
+    access_log.stop()
     print(f"server has been stopped.")
 
 
@@ -45,7 +60,8 @@ app = FastAPI(
     openapi_url=f"{version_prefix}/openapi.json",
     docs_url=f"{version_prefix}/docs",
     redoc_url=f"{version_prefix}/redoc",
-    # lifespan=life_span,
+    lifespan=life_span,
+    default_response_class=ORJSONResponse,
 )
 
 register_all_errors(app)
@@ -55,3 +71,13 @@ app.include_router(book_router, prefix=f"{version_prefix}/books", tags=["books"]
 app.include_router(auth_router, prefix=f"{version_prefix}/auth", tags=["auth"])
 app.include_router(review_router, prefix=f"{version_prefix}/reviews", tags=["reviews"])
 app.include_router(tags_router, prefix=f"{version_prefix}/tags", tags=["tags"])
+app.include_router(
+    autocomplete_router, prefix=f"{version_prefix}/autocomplete", tags=["autocomplete"]
+)
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    body, content_type = render_metrics()
+
+    return Response(body, media_type=content_type)
@@ -0,0 +1,84 @@
+from logging.handlers import QueueHandler, QueueListener
+from src.config import Config
+from src.metrics import stats_collector
+import json
+import logging
+import queue
+import random
+import sys
+
+ACCESS_LOGGER = "bookly.access"
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, the record's msg is the access log entry"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        return json.dumps(record.msg, default=str)
+
+
+class DroppingQueueHandler(QueueHandler):
+    """Hands records to the listener thread, never blocks the event loop"""
+
+    def __init__(self, queue: queue.Queue) -> None:
+        super().__init__(queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # formatting happens on the listener thread
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class AccessLog:
+    """Structured access log written by a background QueueListener
+
+    Errors and slow requests are always logged, other responses are sampled
+    with ACCESS_LOG_SAMPLE_RATE.
+    """
+
+    def __init__(self, queue_size: int, sample_rate: float, slow_ms: float) -> None:
+        self.sample_rate = sample_rate
+        self.slow_ms = slow_ms
+        self.queue = queue.Queue(queue_size)
+        self.handler = DroppingQueueHandler(self.queue)
+        self.listener: QueueListener | None = None
+
+    def should_log(self, status_code: int, duration_ms: float) -> bool:
+        if status_code >= 400 or duration_ms >= self.slow_ms:
+            return True
+
+        return self.sample_rate >= 1 or random.random() < self.sample_rate
+
+    def log(self, entry: dict) -> None:
+        # straight to the handler, a logger would look up the caller frame
+        record = logging.LogRecord(
+            ACCESS_LOGGER, logging.INFO, "", 0, entry, None, None
+        )
+        self.handler.handle(record)
+
+    def start(self) -> None:
+        if self.listener is None:
+            stream = logging.StreamHandler(sys.stdout)
+            stream.setFormatter(JsonFormatter())
+            self.listener = QueueListener(self.queue, stream)
+            self.listener.start()
+
+    def stop(self) -> None:
+        if self.listener is not None:
+            # drains what is already queued
+            self.listener.stop()
+            self.listener = None
+
+
+access_log = AccessLog(
+    Config.ACCESS_LOG_QUEUE_SIZE,
+    Config.ACCESS_LOG_SAMPLE_RATE,
+    Config.ACCESS_LOG_SLOW_MS,
+)
+stats_collector.add("access_log", lambda: {"dropped": access_log.handler.dropped})
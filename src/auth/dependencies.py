@@ -2,12 +2,14 @@ from fastapi import Request, HTTPException, status, Depends
 from fastapi.security import HTTPBearer
 from fastapi.security.http import HTTPAuthorizationCredentials
 from .utils import decode_token
-from src.db.redis import token_in_blocklist
+from src.db.redis import token_in_blocklist, get_token_version
 from src.db.main import get_session
 from sqlmodel.ext.asyncio.session import AsyncSession
 from .service import UserService
+from .schema import TokenUserModel
 from typing import List, Any
 from src.db.models import User
+from src.config import Config
 from src.errors import (
     InvalidToken,
     AccessTokenRequired,
@@ -30,22 +32,26 @@ class TokenBearer(HTTPBearer):
         creds = await super().__call__(request)
 
         token = creds.credentials
-        token_data = decode_token(token)
 
-        if not self.token_valid(token):
-            raise InvalidToken()
+        # decoded and checked against the blocklist once per request, whichever
+        # bearer instance gets there first
+        token_data = getattr(request.state, "token_data", None)
 
-        if await token_in_blocklist(token_data["jti"]):
-            raise InvalidToken()
+        if getattr(request.state, "token", None) != token:
+            token_data = decode_token(token)
 
-        self.verify_token_data(token_data)
+            if token_data is None:
+                raise InvalidToken()
 
-        return token_data
+            if await token_in_blocklist(token_data["jti"]):
+                raise InvalidToken()
 
-    def token_valid(self, token: str) -> bool:
-        token_data = decode_token(token)
+            request.state.token = token
+            request.state.token_data = token_data
+
+        self.verify_token_data(token_data)
 
-        return True if token_data is not None else False
+        return token_data
 
     def verify_token_data(self, token_data):
         raise NotImplementedError("Please Override this method in child class")
@@ -63,8 +69,13 @@ class RefreshTokenBearer(TokenBearer):
             raise RefreshTokenRequired()
 
 
+# shared so FastAPI resolves each bearer once per request
+access_token_bearer = AccessTokenBearer()
+refresh_token_bearer = RefreshTokenBearer()
+
+
 async def get_current_user(
-    token_details: dict = Depends(AccessTokenBearer()),
+    token_details: dict = Depends(access_token_bearer),
     session: AsyncSession = Depends(get_session),
 ):
     user_email = token_details["user"]["email"]
@@ -76,11 +87,31 @@ async def get_current_user(
     return user
 
 
+async def get_token_user(
+    token_details: dict = Depends(access_token_bearer),
+    session: AsyncSession = Depends(get_session),
+):
+    """Build the current user from the access token claims alone"""
+    claims = token_details["user"]
+
+    if "token_version" not in claims:
+        # issued before claims-only mode was turned on
+        return await get_current_user(token_details, session)
+
+    if claims["token_version"] != await get_token_version(claims["user_uid"]):
+        raise InvalidToken()
+
+    return TokenUserModel(**claims)
+
+
+get_current_principal = get_token_user if Config.AUTH_CLAIMS_ONLY else get_current_user
+
+
 class RoleChecker:
     def __init__(self, allowed_roles: List[str]) -> None:
         self.allowed_roles = allowed_roles
 
-    def __call__(self, current_user: User = Depends(get_current_user)) -> Any:
+    def __call__(self, current_user: User = Depends(get_current_principal)) -> Any:
         if not current_user.is_verified:
             raise AccountNotVerified()
 
@@ -2,6 +2,7 @@ from fastapi import APIRouter, status, Depends, HTTPException, BackgroundTasks
 from sqlmodel.ext.asyncio.session import AsyncSession
 from .service import UserService
 from src.db.main import get_session
+from src.db.loaders import USER_DETAIL_OPTIONS
 from datetime import timedelta
 from fastapi.responses import JSONResponse
 from datetime import datetime
@@ -15,34 +16,36 @@ from .schema import (
 )
 from .utils import (
     create_access_token,
-    verify_password,
     create_url_safe_token,
     decode_url_safe_token,
-    generate_password_hash,
+    password_hasher,
 )
 from src.db.redis import add_jti_to_blocklist
 from src.errors import UserAlreadyExists, UserNotFound, InvalidCredentials, InvalidToken
 from .dependencies import (
-    RefreshTokenBearer,
-    AccessTokenBearer,
+    refresh_token_bearer,
+    access_token_bearer,
     get_current_user,
     RoleChecker,
 )
-from src.mail import crate_message, mail
 from src.config import Config
-from src.celery_tasks import send_email
+from src.celery_tasks import send_bulk_email
+from src.outbox import add_email, outbox_dispatcher
+from src.rate_limit import auth_rate_limit
 
 
 auth_router = APIRouter()
 user_service = UserService()
-refresh_token_bearer = RefreshTokenBearer()
-access_token_bearer = AccessTokenBearer()
 role_checker = RoleChecker(["admin", "user"])
 
 REFRESH_TOKEN_EXPIRY = 2
 
 
-@auth_router.post("/signup", status_code=status.HTTP_201_CREATED)
+@auth_router.post(
+    "/signup",
+    status_code=status.HTTP_201_CREATED,
+    dependencies=[Depends(auth_rate_limit)],
+)
 async def create_user_Account(
     user_data: UserCreateModel,
     bg_task: BackgroundTasks,
@@ -55,7 +58,6 @@ async def create_user_Account(
     if user_exists:
         raise UserAlreadyExists()
 
-    new_user = await user_service.create_user(user_data, session)
     token = create_url_safe_token({"email": email})
 
     link = f"http://{Config.DOMAIN}/api/v1/auth/verify/{token}"
@@ -75,9 +77,14 @@ async def create_user_Account(
 
     # bg_task.add_task(mail.send_message, message)
 
-    # 3rd best method
-    emails = [email]
-    send_email.delay(emails, subject="Verify your email", body=html_message)
+    # 3rd method
+    # send_email.delay([email], subject="Verify your email", body=html_message)
+
+    # outbox, committed by create_user together with the user
+    add_email(session, [email], subject="Verify your email", body=html_message)
+
+    new_user = await user_service.create_user(user_data, session)
+    outbox_dispatcher.notify()
 
     return {
         "message": "Account Created! Check email to verify your account",
@@ -110,7 +117,7 @@ async def verify_token_account(
     )
 
 
-@auth_router.post("/login")
+@auth_router.post("/login", dependencies=[Depends(auth_rate_limit)])
 async def login_users(
     login_data: UserLoginModel, session: AsyncSession = Depends(get_session)
 ):
@@ -119,15 +126,11 @@ async def login_users(
 
     user = await user_service.get_user_by_email(email, session)
     if user is not None:
-        password_valid = verify_password(password, user.password_hash)
+        password_valid = await password_hasher.verify(password, user.password_hash)
 
         if password_valid:
             access_token = create_access_token(
-                user_data={
-                    "email": user.email,
-                    "user_uid": str(user.uid),
-                    "role": user.role,
-                }
+                user_data=await user_service.get_token_claims(user)
             )
 
             refresh_token = create_access_token(
@@ -149,11 +152,24 @@ async def login_users(
 
 
 @auth_router.get("/refresh_token")
-async def get_new_access_token(token_details: dict = Depends(refresh_token_bearer)):
+async def get_new_access_token(
+    token_details: dict = Depends(refresh_token_bearer),
+    session: AsyncSession = Depends(get_session),
+):
     expiry_timestamp = token_details["exp"]
 
     if datetime.fromtimestamp(expiry_timestamp) > datetime.now():
-        new_access_token = create_access_token(user_data=token_details["user"])
+        # claims are reloaded so a refreshed token never carries a stale role
+        user = await user_service.get_user_by_email(
+            token_details["user"]["email"], session
+        )
+
+        if not user:
+            raise UserNotFound()
+
+        new_access_token = create_access_token(
+            user_data=await user_service.get_token_claims(user)
+        )
 
         return JSONResponse(content={"access_token": new_access_token})
 
@@ -161,8 +177,14 @@ async def get_new_access_token(token_details: dict = Depends(refresh_token_beare
 
 
 @auth_router.get("/me", response_model=UserBooksModel)
-async def get_me(user=Depends(get_current_user), _: bool = Depends(role_checker)):
-    return user
+async def get_me(
+    user=Depends(get_current_user),
+    _: bool = Depends(role_checker),
+    session: AsyncSession = Depends(get_session),
+):
+    return await user_service.get_user_by_email(
+        user.email, session, options=USER_DETAIL_OPTIONS
+    )
 
 
 @auth_router.get("/logout")
@@ -175,8 +197,10 @@ async def revoke_token(token_details: dict = Depends(access_token_bearer)):
     )
 
 
-@auth_router.post("/password-reset-request")
-async def password_rest_request(email_data: PasswordResetRequestModel):
+@auth_router.post("/password-reset-request", dependencies=[Depends(auth_rate_limit)])
+async def password_rest_request(
+    email_data: PasswordResetRequestModel, session: AsyncSession = Depends(get_session)
+):
     email = email_data.email
 
     token = create_url_safe_token({"email": email})
@@ -188,10 +212,9 @@ async def password_rest_request(email_data: PasswordResetRequestModel):
     <p>Please click <a href="{link}">this link</a> reset password.</p>
     """
 
-    message = crate_message(
-        recipients=[email], subject="reset password", body=html_message
-    )
-    await mail.send_message(message)
+    add_email(session, [email], subject="reset password", body=html_message)
+    await session.commit()
+    outbox_dispatcher.notify()
 
     return JSONResponse(
         content={
@@ -221,7 +244,7 @@ async def reset_account_password(
         if not user:
             raise UserNotFound()
 
-        password_hash = generate_password_hash(passwords.new_password)
+        password_hash = await password_hasher.hash(passwords.new_password)
 
         await user_service.update_user(
             user, {"password_hash": password_hash}, session=session
@@ -238,9 +261,9 @@ async def reset_account_password(
     )
 
 
-@auth_router.post("/send-email")
+@auth_router.post("/send-email", dependencies=[Depends(auth_rate_limit)])
 async def send_email_user(emails: EmailModel):
     emails = emails.addresses
     html = "<h1>welcome</h1>"
 
-    send_email.delay(emails, subject="hello", body=html)
+    send_bulk_email.delay(emails, subject="hello", body=html)
@@ -30,6 +30,14 @@ class UserModel(BaseModel):
     updated_at: datetime
 
 
+class TokenUserModel(BaseModel):
+    email: str
+    user_uid: uuid.UUID
+    role: str
+    is_verified: bool
+    token_version: int
+
+
 class UserBooksModel(UserModel):
     books: List[Book]
     reviews: List[ReviewModal]
@@ -1,13 +1,17 @@
 from sqlmodel.ext.asyncio.session import AsyncSession
-from .utils import generate_password_hash, verify_password
+from .utils import password_hasher
 from sqlmodel import select
 from .schema import UserCreateModel
 from src.db.models import User
+from src.db.redis import get_token_version, bump_token_version
+
+# changing any of these makes the claims of issued access tokens stale
+CLAIM_FIELDS = {"role", "is_verified", "password_hash"}
 
 
 class UserService:
-    async def get_user_by_email(self, email: str, session: AsyncSession):
-        statement = select(User).where(User.email == email)
+    async def get_user_by_email(self, email: str, session: AsyncSession, options=()):
+        statement = select(User).where(User.email == email).options(*options)
         result = await session.exec(statement)
 
         return result.first()
@@ -22,7 +26,7 @@ class UserService:
 
         new_user = User(**user_data_dict)
 
-        new_user.password_hash = generate_password_hash(user_data_dict["password"])
+        new_user.password_hash = await password_hasher.hash(user_data_dict["password"])
         new_user.role = "user"
 
         session.add(new_user)
@@ -37,4 +41,18 @@ class UserService:
 
         await session.commit()
 
+        if CLAIM_FIELDS.intersection(user_data):
+            await bump_token_version(str(user.uid))
+
         return user
+
+    async def get_token_claims(self, user: User) -> dict:
+        """User data embedded in access tokens, enough to authorize without the db"""
+
+        return {
+            "email": user.email,
+            "user_uid": str(user.uid),
+            "role": user.role,
+            "is_verified": user.is_verified,
+            "token_version": await get_token_version(str(user.uid)),
+        }
@@ -2,6 +2,14 @@ from passlib.context import CryptContext
 from datetime import timedelta, datetime
 from src.config import Config
 from itsdangerous import URLSafeTimedSerializer
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from src.errors import PasswordHasherBusy
+from src.metrics import stats_collector
+import asyncio
+import hashlib
+import os
+import time
 import jwt
 import uuid
 import logging
@@ -19,6 +27,79 @@ def verify_password(password: str, hash: str) -> bool:
     return password_context.verify(password, hash)
 
 
+class PasswordHasher:
+    """Runs bcrypt in a dedicated process pool so it never blocks the event loop"""
+
+    def __init__(self, workers: int | None, queue_limit: int) -> None:
+        self.workers = workers or os.cpu_count() or 1
+        self.queue_limit = queue_limit
+        self.in_flight = 0
+        self.rejected = 0
+        self.completed = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self._pool: ProcessPoolExecutor | None = None
+
+    @property
+    def pool(self) -> ProcessPoolExecutor:
+        # created on first use so importing the app never forks
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        return self._pool
+
+    @property
+    def queue_depth(self) -> int:
+        return max(self.in_flight - self.workers, 0)
+
+    async def _run(self, func, *args):
+        # every process is busy and queue_limit calls are already waiting
+        if self.in_flight - self.workers >= self.queue_limit:
+            self.rejected += 1
+            raise PasswordHasherBusy()
+
+        start = time.perf_counter()
+        self.in_flight += 1
+
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                self.pool, func, *args
+            )
+        finally:
+            self.in_flight -= 1
+            elapsed = time.perf_counter() - start
+            self.completed += 1
+            self.total_seconds += elapsed
+            self.max_seconds = max(self.max_seconds, elapsed)
+
+    async def hash(self, password: str) -> str:
+        return await self._run(generate_password_hash, password)
+
+    async def verify(self, password: str, hash: str) -> bool:
+        return await self._run(verify_password, password, hash)
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": self.in_flight,
+            "queue_depth": self.queue_depth,
+            "rejected": self.rejected,
+            "completed": self.completed,
+            "avg_seconds": self.total_seconds / self.completed if self.completed else 0,
+            "max_seconds": self.max_seconds,
+        }
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
+
+
+password_hasher = PasswordHasher(
+    workers=Config.PASSWORD_HASH_WORKERS,
+    queue_limit=Config.PASSWORD_HASH_QUEUE_LIMIT,
+)
+stats_collector.add("password_hasher", password_hasher.stats)
+
+
 def create_access_token(
     user_data: dict, expiry: timedelta = None, refresh: bool = False
 ):
@@ -38,11 +119,60 @@ def create_access_token(
     return token
 
 
+class TokenCache:
+    """Bounded LRU of verified tokens, keyed by token hash and dropped at `exp`"""
+
+    def __init__(self, maxsize: int) -> None:
+        self.maxsize = maxsize
+        self._tokens: OrderedDict[bytes, dict] = OrderedDict()
+
+    def _key(self, token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, token: str) -> dict | None:
+        key = self._key(token)
+        token_data = self._tokens.get(key)
+
+        if token_data is None:
+            return None
+
+        if token_data["exp"] <= time.time():
+            del self._tokens[key]
+            return None
+
+        self._tokens.move_to_end(key)
+        return token_data
+
+    def set(self, token: str, token_data: dict) -> None:
+        if self.maxsize <= 0 or "exp" not in token_data:
+            return
+
+        key = self._key(token)
+        self._tokens[key] = token_data
+        self._tokens.move_to_end(key)
+
+        if len(self._tokens) > self.maxsize:
+            self._tokens.popitem(last=False)
+
+    def clear(self) -> None:
+        self._tokens.clear()
+
+
+token_cache = TokenCache(maxsize=Config.TOKEN_CACHE_SIZE)
+
+
 def decode_token(token: str) -> dict:
+    """Verify and decode a jwt, the returned dict is shared and must not be mutated"""
+    token_data = token_cache.get(token)
+
+    if token_data is not None:
+        return token_data
+
     try:
         token_data = jwt.decode(
             jwt=token, key=Config.JWT_SECRET, algorithms=Config.JWT_ALGORITHM
         )
+        token_cache.set(token, token_data)
         return token_data
 
     except jwt.PyJWTError as e:
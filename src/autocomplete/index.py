@@ -0,0 +1,110 @@
+from typing import Iterable
+import bisect
+import sys
+
+# word positions indexed per value, so "potter" finds "Harry Potter"
+MAX_WORD_STARTS = 6
+
+
+def normalize(value: str) -> str:
+    return " ".join(value.casefold().split())
+
+
+class PrefixIndex:
+    """Sorted array of keys searched with bisect
+
+    Every value is stored once per word start, `values` runs parallel to `keys`
+    so no tuple is kept per entry. `counts` tracks how many rows share a value
+    so it is only dropped when the last one goes.
+    """
+
+    def __init__(self, counts: dict[str, int] | None = None) -> None:
+        self.counts: dict[str, int] = dict(counts or {})
+        pairs = sorted(
+            (key, value) for value in self.counts for key in self._keys_for(value)
+        )
+        self.keys: list[str] = [key for key, _ in pairs]
+        self.values: list[str] = [value for _, value in pairs]
+
+    def _keys_for(self, value: str) -> list[str]:
+        words = normalize(value).split()
+
+        return [" ".join(words[i:]) for i in range(min(len(words), MAX_WORD_STARTS))]
+
+    def _position(self, key: str, value: str) -> int:
+        i = bisect.bisect_left(self.keys, key)
+
+        while i < len(self.keys) and self.keys[i] == key and self.values[i] < value:
+            i += 1
+
+        return i
+
+    def add(self, value: str) -> None:
+        if not value:
+            return
+
+        self.counts[value] = self.counts.get(value, 0) + 1
+
+        if self.counts[value] == 1:
+            for key in self._keys_for(value):
+                i = self._position(key, value)
+                self.keys.insert(i, key)
+                self.values.insert(i, value)
+
+    def remove(self, value: str) -> None:
+        count = self.counts.get(value, 0)
+
+        if count > 1:
+            self.counts[value] = count - 1
+            return
+
+        if count == 0:
+            return
+
+        del self.counts[value]
+
+        for key in self._keys_for(value):
+            i = self._position(key, value)
+            if i < len(self.keys) and self.values[i] == value:
+                del self.keys[i]
+                del self.values[i]
+
+    def search(self, prefix: str, limit: int) -> list[tuple[str, str]]:
+        """(key, value) pairs whose key starts with `prefix`, one per value"""
+
+        prefix = normalize(prefix)
+        matches = {}
+        i = bisect.bisect_left(self.keys, prefix)
+
+        while i < len(self.keys) and len(matches) < limit:
+            if not self.keys[i].startswith(prefix):
+                break
+
+            matches.setdefault(self.values[i], self.keys[i])
+            i += 1
+
+        return [(key, value) for value, key in matches.items()]
+
+    def memory_bytes(self) -> int:
+        """Rough footprint of the arrays and keys, values are shared with counts"""
+
+        return (
+            sys.getsizeof(self.keys)
+            + sys.getsizeof(self.values)
+            + sum(map(sys.getsizeof, self.keys))
+        )
+
+
+def merge_suggestions(
+    results: Iterable[tuple[str, list[tuple[str, str]]]], limit: int
+) -> list[dict]:
+    """Merge per-kind matches in key order"""
+
+    suggestions = sorted(
+        (key, kind, value) for kind, matches in results for key, value in matches
+    )
+
+    return [
+        {"kind": kind, "value": value, "fuzzy": False}
+        for _, kind, value in suggestions[:limit]
+    ]
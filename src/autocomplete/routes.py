@@ -0,0 +1,32 @@
+from fastapi import APIRouter, Depends, Query
+from sqlmodel.ext.asyncio.session import AsyncSession
+from typing import List, Literal, Optional
+from src.db.main import get_session
+from src.db.query_budget import QueryBudget
+from src.auth.dependencies import access_token_bearer, RoleChecker
+from .schemas import SuggestionModel, AutocompleteStatsModel
+from .service import autocomplete, SOURCES
+
+# suggestions come from memory, at most the fuzzy fallback or the role lookup
+autocomplete_router = APIRouter(dependencies=[Depends(QueryBudget(1))])
+admin_role_checker = Depends(RoleChecker(["admin"]))
+
+
+@autocomplete_router.get("/", response_model=List[SuggestionModel])
+async def suggest(
+    q: str = Query(min_length=1, max_length=100),
+    kind: Optional[Literal["title", "author", "tag"]] = None,
+    limit: int = Query(default=10, ge=1, le=25),
+    session: AsyncSession = Depends(get_session),
+    token_details: dict = Depends(access_token_bearer),
+):
+    kinds = [kind] if kind is not None else list(SOURCES)
+
+    return await autocomplete.suggest(q, kinds, limit, session)
+
+
+@autocomplete_router.get(
+    "/stats", response_model=AutocompleteStatsModel, dependencies=[admin_role_checker]
+)
+async def autocomplete_stats():
+    return autocomplete.stats()
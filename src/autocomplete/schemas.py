@@ -0,0 +1,18 @@
+from typing import Literal, Optional
+
+from pydantic import BaseModel
+
+
+class SuggestionModel(BaseModel):
+    kind: Literal["title", "author", "tag"]
+    value: str
+    fuzzy: bool
+
+
+class AutocompleteStatsModel(BaseModel):
+    ready: bool
+    entries: dict[str, int]
+    memory_bytes: int
+    rebuilds: int
+    rebuild_seconds: float
+    rebuilt_at: Optional[float]
@@ -0,0 +1,250 @@
+from sqlalchemy import func, literal, select, union_all
+from sqlalchemy.exc import DBAPIError
+from sqlmodel.ext.asyncio.session import AsyncSession
+from src.config import Config
+from src.db.main import Session
+from src.db.models import Book, Tag
+from src.metrics import stats_collector
+from .index import PrefixIndex, merge_suggestions
+import asyncio
+import contextlib
+import logging
+import time
+import uuid
+
+# trigrams need at least this many characters to be useful
+FUZZY_MIN_LENGTH = 3
+
+SOURCES = {
+    "title": Book.title,
+    "author": Book.author,
+    "tag": Tag.name,
+}
+
+
+class Autocomplete:
+    """Per-worker prefix indexes over book titles, authors and tag names
+
+    Writes in BookService and TagService update the indexes in place, a full
+    rebuild runs at startup, every AUTOCOMPLETE_REFRESH_SECONDS and after bulk
+    imports to pick up writes made by other workers.
+    """
+
+    def __init__(self) -> None:
+        self.indexes = {kind: PrefixIndex() for kind in SOURCES}
+        self.ready = False
+        self.rebuilds = 0
+        self.rebuild_seconds = 0.0
+        self.rebuilt_at: float | None = None
+        # (kind, row uid) -> value written, None once removed, while rebuilding
+        self._pending: dict[tuple[str, uuid.UUID], str | None] | None = None
+        self._rebuild_requested = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+    def add(self, kind: str, value: str, uid: uuid.UUID) -> None:
+        self.indexes[kind].add(value)
+
+        if self._pending is not None:
+            self._pending[(kind, uid)] = value
+
+    def remove(self, kind: str, value: str, uid: uuid.UUID) -> None:
+        self.indexes[kind].remove(value)
+
+        if self._pending is not None:
+            self._pending[(kind, uid)] = None
+
+    def add_book(self, book: Book) -> None:
+        self.add("title", book.title, book.uid)
+        self.add("author", book.author, book.uid)
+
+    def remove_book(self, book: Book) -> None:
+        self.remove("title", book.title, book.uid)
+        self.remove("author", book.author, book.uid)
+
+    def search(self, q: str, kinds: list[str], limit: int) -> list[dict]:
+        return merge_suggestions(
+            ((kind, self.indexes[kind].search(q, limit)) for kind in kinds), limit
+        )
+
+    async def suggest(
+        self, q: str, kinds: list[str], limit: int, session: AsyncSession
+    ) -> list[dict]:
+        """Prefix matches from memory, trigram matches from postgres on a miss"""
+
+        suggestions = self.search(q, kinds, limit) if self.ready else []
+
+        # only a miss (usually a typo) costs a database round trip
+        if (
+            not suggestions
+            and Config.AUTOCOMPLETE_FUZZY
+            and len(q.strip()) >= FUZZY_MIN_LENGTH
+        ):
+            suggestions = [
+                {"kind": kind, "value": value, "fuzzy": True}
+                for kind, value in await self.fuzzy(q, kinds, limit, session)
+            ]
+
+        return suggestions
+
+    async def fuzzy(
+        self, q: str, kinds: list[str], limit: int, session: AsyncSession
+    ) -> list[tuple[str, str]]:
+        """pg_trgm similarity matches served by the gin_trgm_ops indexes"""
+
+        statements = []
+
+        for kind in kinds:
+            column = SOURCES[kind]
+            score = func.similarity(column, q)
+            statements.append(
+                select(
+                    literal(kind).label("kind"),
+                    column.label("value"),
+                    score.label("score"),
+                )
+                .where(column.op("%")(q))
+                .group_by(column)
+                .order_by(score.desc())
+                .limit(limit)
+            )
+
+        matches = union_all(*statements).subquery()
+        statement = (
+            select(matches.c.kind, matches.c.value)
+            .order_by(matches.c.score.desc())
+            .limit(limit)
+        )
+
+        try:
+            result = await session.execute(statement)
+        except DBAPIError:
+            # pg_trgm is missing, answer with prefix matches only
+            logging.exception("autocomplete fuzzy lookup failed")
+            await session.rollback()
+            return []
+
+        return [tuple(row) for row in result.all()]
+
+    async def rebuild(self, session: AsyncSession) -> None:
+        """Load every value and swap in freshly sorted indexes
+
+        A row written here while loading may or may not be in the snapshot, so
+        its value in the snapshot is read back and swapped for the one written.
+        The session must not have begun a transaction yet.
+        """
+
+        start = time.perf_counter()
+        self._pending = {}
+
+        try:
+            # the counts and the rows read back must come from one snapshot
+            await session.connection(
+                execution_options={"isolation_level": "REPEATABLE READ"}
+            )
+            statement = union_all(
+                *(
+                    select(
+                        literal(kind).label("kind"),
+                        column.label("value"),
+                        func.count().label("count"),
+                    ).group_by(column)
+                    for kind, column in SOURCES.items()
+                )
+            )
+            result = await session.execute(statement)
+
+            counts = {kind: {} for kind in SOURCES}
+            for kind, value, count in result.all():
+                counts[kind][value] = count
+
+            # sorting a large catalogue is CPU bound, keep it off the event loop
+            indexes = await asyncio.to_thread(
+                lambda: {kind: PrefixIndex(counts[kind]) for kind in SOURCES}
+            )
+
+            # rows keep being written while their snapshot values are read
+            snapshot = {}
+            while missing := [key for key in self._pending if key not in snapshot]:
+                snapshot.update(await self.snapshot_values(missing, session))
+
+            for (kind, uid), value in self._pending.items():
+                if snapshot[(kind, uid)] is not None:
+                    indexes[kind].remove(snapshot[(kind, uid)])
+                if value is not None:
+                    indexes[kind].add(value)
+        finally:
+            self._pending = None
+
+        self.indexes = indexes
+        self.ready = True
+        self.rebuilds += 1
+        self.rebuilt_at = time.time()
+        self.rebuild_seconds = time.perf_counter() - start
+
+    async def snapshot_values(
+        self, keys: list[tuple[str, uuid.UUID]], session: AsyncSession
+    ) -> dict[tuple[str, uuid.UUID], str | None]:
+        """Value of each (kind, row uid) in the session's snapshot, None if the
+        row is not there"""
+
+        values = dict.fromkeys(keys)
+
+        for kind, column in SOURCES.items():
+            uids = [uid for key_kind, uid in keys if key_kind == kind]
+            if not uids:
+                continue
+
+            table = column.class_
+            result = await session.execute(
+                select(table.uid, column).where(table.uid.in_(uids))
+            )
+            for uid, value in result.all():
+                values[(kind, uid)] = value
+
+        return values
+
+    def request_rebuild(self) -> None:
+        self._rebuild_requested.set()
+
+    def stats(self) -> dict:
+        return {
+            "ready": self.ready,
+            "entries": {kind: len(index.keys) for kind, index in self.indexes.items()},
+            "memory_bytes": sum(
+                index.memory_bytes() for index in self.indexes.values()
+            ),
+            "rebuilds": self.rebuilds,
+            "rebuild_seconds": self.rebuild_seconds,
+            "rebuilt_at": self.rebuilt_at,
+        }
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                async with Session() as session:
+                    await self.rebuild(session)
+            except Exception:
+                logging.exception("autocomplete rebuild failed")
+
+            self._rebuild_requested.clear()
+
+            with contextlib.suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(
+                    self._rebuild_requested.wait(),
+                    Config.AUTOCOMPLETE_REFRESH_SECONDS,
+                )
+
+
+autocomplete = Autocomplete()
+stats_collector.add("autocomplete", autocomplete.stats)
@@ -1,38 +1,81 @@
-from fastapi import APIRouter, status, Depends
+from fastapi import APIRouter, status, Depends, Query, Request, UploadFile
 from fastapi.exceptions import HTTPException
-from typing import List
+from fastapi.responses import Response, StreamingResponse
+from datetime import datetime
+from typing import List, Literal, Optional
 from src.db.main import get_session
-from src.books.schema import Book, BookUpdateModal, BookCreateModal, BookDetailModal
+from src.books.schema import (
+    Book,
+    BookUpdateModal,
+    BookCreateModal,
+    BookDetailModal,
+    BookPage,
+    BookListPage,
+    BookImportResult,
+    book_page_adapter,
+    book_list_page_adapter,
+    book_detail_adapter,
+    book_adapter,
+)
 from sqlmodel.ext.asyncio.session import AsyncSession
 from src.books.service import BookService
-from src.auth.dependencies import AccessTokenBearer, RoleChecker
+from src.auth.dependencies import access_token_bearer, RoleChecker
+from src.db.loaders import BOOK_DETAIL_OPTIONS
 from src.errors import BookNotFound
+from src.db.query_budget import QueryBudget
+from src.rate_limit import write_rate_limit
+from src.http_cache import make_etag, cache_headers, is_not_modified
+from src.responses import model_response
+from .utils import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, aiter_import_rows
 
-book_router = APIRouter()
+book_router = APIRouter(dependencies=[Depends(write_rate_limit)])
 book_service = BookService()
-access_token_barer = AccessTokenBearer()
 role_checker = Depends(RoleChecker(["admin", "user"]))
 
 
-@book_router.get("/", response_model=List[Book], dependencies=[role_checker])
+@book_router.get(
+    "/",
+    response_model=BookListPage,
+    dependencies=[role_checker, Depends(QueryBudget(4))],
+)
 async def get_all_books(
+    limit: int = Query(default=DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    sort: Literal["created_at", "rating"] = "created_at",
+    tag: List[str] = Query(default=[]),
+    language: Optional[str] = None,
+    publisher: Optional[str] = None,
     session: AsyncSession = Depends(get_session),
-    token_details: dict = Depends(access_token_barer),
-) -> list:
-    books = await book_service.get_all_books(session)
-    return books
+    token_details: dict = Depends(access_token_bearer),
+) -> dict:
+    books = await book_service.get_all_books(
+        session,
+        limit=limit,
+        cursor=cursor,
+        sort=sort,
+        tags=tag,
+        language=language,
+        publisher=publisher,
+    )
+    return model_response(book_list_page_adapter, books)
 
 
 @book_router.get(
-    "/user/{user_uid}", response_model=List[Book], dependencies=[role_checker]
+    "/user/{user_uid}",
+    response_model=BookPage,
+    dependencies=[role_checker, Depends(QueryBudget(3))],
 )
 async def get_user_books_submission(
     user_uid: str,
+    limit: int = Query(default=DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
     session: AsyncSession = Depends(get_session),
-    token_details: dict = Depends(access_token_barer),
-) -> list:
-    books = await book_service.get_user_books(user_uid, session)
-    return books
+    token_details: dict = Depends(access_token_bearer),
+) -> dict:
+    books = await book_service.get_user_books(
+        user_uid, session, limit=limit, cursor=cursor
+    )
+    return model_response(book_page_adapter, books)
 
 
 @book_router.post(
@@ -44,25 +87,84 @@ async def get_user_books_submission(
 async def create_a_book(
     book_data: BookCreateModal,
     session: AsyncSession = Depends(get_session),
-    token_details: dict = Depends(access_token_barer),
+    token_details: dict = Depends(access_token_bearer),
 ) -> dict:
     user_uid = token_details.get("user")["user_uid"]
     new_book = await book_service.create_book(book_data, user_uid, session)
-    return new_book
+    return model_response(book_adapter, new_book, status_code=status.HTTP_201_CREATED)
+
+
+@book_router.get(
+    "/search",
+    response_model=BookPage,
+    dependencies=[role_checker, Depends(QueryBudget(3))],
+)
+async def search_books(
+    q: str = Query(min_length=1),
+    language: Optional[str] = None,
+    limit: int = Query(default=DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    session: AsyncSession = Depends(get_session),
+    token_details: dict = Depends(access_token_bearer),
+) -> dict:
+    books = await book_service.search_books(
+        q, session, limit=limit, cursor=cursor, language=language
+    )
+    return model_response(book_page_adapter, books)
+
+
+@book_router.get("/export", dependencies=[role_checker])
+async def export_books(updated_since: Optional[datetime] = None):
+    return StreamingResponse(
+        await book_service.export_books(updated_since),
+        media_type="application/x-ndjson",
+    )
+
+
+@book_router.post(
+    "/import", response_model=BookImportResult, dependencies=[role_checker]
+)
+async def import_books(
+    file: UploadFile,
+    format: Literal["csv", "ndjson"] = "csv",
+    session: AsyncSession = Depends(get_session),
+    token_details: dict = Depends(access_token_bearer),
+) -> dict:
+    user_uid = token_details.get("user")["user_uid"]
+    result = await book_service.import_books(
+        aiter_import_rows(file.file, format), user_uid, session
+    )
+    return result
 
 
 @book_router.get(
-    "/{book_uid}", response_model=BookDetailModal, dependencies=[role_checker]
+    "/{book_uid}",
+    response_model=BookDetailModal,
+    dependencies=[role_checker, Depends(QueryBudget(5))],
 )
 async def get_book(
     book_uid: str,
+    request: Request,
     session: AsyncSession = Depends(get_session),
-    token_details: dict = Depends(access_token_barer),
+    token_details: dict = Depends(access_token_bearer),
 ) -> dict:
-    book = await book_service.get_book(book_uid, session)
+    version = await book_service.get_book_version(book_uid, session)
+
+    if version is None:
+        raise BookNotFound()
+
+    updated_at, tags_digest, tags_updated_at = version
+    etag = make_etag(book_uid, updated_at, tags_digest, tags_updated_at)
+    last_modified = max(filter(None, (updated_at, tags_updated_at)), default=None)
+    headers = cache_headers(etag, last_modified)
+
+    if is_not_modified(request, etag, last_modified):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    book = await book_service.get_book(book_uid, session, options=BOOK_DETAIL_OPTIONS)
 
     if book:
-        return book
+        return model_response(book_detail_adapter, book, headers=headers)
     else:
         raise BookNotFound()
 
@@ -72,14 +174,14 @@ async def update_book(
     book_uid: str,
     book_update_data: BookUpdateModal,
     session: AsyncSession = Depends(get_session),
-    token_details: dict = Depends(access_token_barer),
+    token_details: dict = Depends(access_token_bearer),
 ) -> dict:
     updated_book = await book_service.update_book(book_uid, book_update_data, session)
 
     if updated_book is None:
         raise BookNotFound()
     else:
-        return updated_book
+        return model_response(book_adapter, updated_book)
 
 
 @book_router.delete(
@@ -88,7 +190,7 @@ async def update_book(
 async def delete_book(
     book_uid: str,
     session: AsyncSession = Depends(get_session),
-    token_details: dict = Depends(access_token_barer),
+    token_details: dict = Depends(access_token_bearer),
     dependencies=[role_checker],
 ):
     book_to_delete = await book_service.delete_book(book_uid, session)
@@ -1,6 +1,6 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, TypeAdapter, field_validator
 from datetime import datetime, date
-from typing import List, Optional
+from typing import Dict, List, Optional
 from src.reviews.schema import ReviewModal
 from src.tags.schemas import TagModel
 import uuid
@@ -16,10 +16,35 @@ class Book(BaseModel):
     language: str
     created_at: datetime
     updated_at: datetime
+    review_count: int = 0
+    rating_avg: float = 0
     tags: List[TagModel] = []
 
 
+class BookPage(BaseModel):
+    books: List[Book]
+    next_cursor: Optional[str] = None
+
+
+class FacetCount(BaseModel):
+    value: str
+    count: int
+
+
+class BookFacets(BaseModel):
+    tags: List[FacetCount]
+    language: List[FacetCount]
+    publisher: List[FacetCount]
+
+
+class BookListPage(BookPage):
+    # only computed for the first page, the filters do not change while paging
+    facets: Optional[BookFacets] = None
+
+
 class BookDetailModal(Book):
+    # review count per rating value, keyed by the rating as a string
+    rating_histogram: Dict[str, int] = {}
     reviews: List[ReviewModal]
     tags: List[TagModel]
 
@@ -33,9 +58,48 @@ class BookCreateModal(BaseModel):
     published_date: date
 
 
+# postgres integer column range, COPY aborts the whole import on a value past it
+PG_INTEGER_MIN = -(2**31)
+PG_INTEGER_MAX = 2**31 - 1
+
+
+class BookImportRow(BookCreateModal):
+    """An import row that fits the books table, checked before the COPY"""
+
+    page_count: int = Field(ge=PG_INTEGER_MIN, le=PG_INTEGER_MAX)
+
+    @field_validator("title", "author", "publisher", "language")
+    @classmethod
+    def no_nul(cls, value: str) -> str:
+        # postgres text can't hold NUL
+        if "\x00" in value:
+            raise ValueError("must not contain NUL characters")
+        return value
+
+
+class BookImportError(BaseModel):
+    row: int
+    errors: List[str]
+
+
+class BookImportResult(BaseModel):
+    imported: int
+    failed: int
+    errors: List[BookImportError]
+    seconds: float
+    rows_per_second: float
+
+
 class BookUpdateModal(BaseModel):
     title: str
     author: str
     publisher: str
     page_count: int
     language: str
+
+
+# built once per process, see src/responses.py
+book_adapter = TypeAdapter(Book)
+book_page_adapter = TypeAdapter(BookPage)
+book_list_page_adapter = TypeAdapter(BookListPage)
+book_detail_adapter = TypeAdapter(BookDetailModal)
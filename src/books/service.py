@@ -1,31 +1,272 @@
 from sqlmodel.ext.asyncio.session import AsyncSession
-from src.books.schema import BookCreateModal, BookUpdateModal
-from sqlmodel import select, desc
+from src.books.schema import BookCreateModal, BookImportRow, BookUpdateModal
+from sqlmodel import select, desc, text
+from sqlalchemy import Text, cast, distinct, func, literal, tuple_
+from sqlalchemy.dialects.postgresql import REGCONFIG, aggregate_order_by
+from sqlalchemy.exc import DBAPIError
+from pydantic import ValidationError
 from datetime import datetime
-from src.db.models import Book
+from typing import AsyncIterable, Iterable, Optional
+from src.db.models import Book, BookTag, Tag
+from src.db.loaders import BOOK_OPTIONS, BOOK_DELETE_OPTIONS
+from src.db.export import naive_utc, stream_ndjson
+from src.autocomplete.service import autocomplete
+from src.errors import BookImportFailed, InvalidImportFile
+from .utils import (
+    DEFAULT_PAGE_SIZE,
+    SORT_FIELDS,
+    MAX_FACET_VALUES,
+    IMPORT_CHUNK_SIZE,
+    MAX_IMPORT_ERRORS,
+    encode_cursor,
+    decode_cursor,
+    search_configs,
+)
+import asyncpg
+import logging
+import time
+import uuid
+
+# plain columns of books, written by bulk import and read by export
+BOOK_COLUMNS = (
+    "uid",
+    "title",
+    "author",
+    "publisher",
+    "published_date",
+    "page_count",
+    "language",
+    "user_uid",
+    "created_at",
+    "updated_at",
+)
 
 
 class BookService:
-    async def get_all_books(self, session: AsyncSession):
-        statement = select(Book).order_by(desc(Book.created_at))
+    def paginate(
+        self, statement, limit: int, cursor: Optional[str], sort: str = "created_at"
+    ):
+        """Apply keyset pagination on (sort key, uid) to a books query"""
+
+        column = getattr(Book, SORT_FIELDS[sort])
+
+        if cursor is not None:
+            key, uid = decode_cursor(cursor, sort)
+            statement = statement.where(tuple_(column, Book.uid) < tuple_(key, uid))
+
+        # fetch one extra row to know whether there is a next page
+        return statement.order_by(desc(column), desc(Book.uid)).limit(limit + 1)
+
+    def build_page(self, books: list, limit: int, sort: str = "created_at") -> dict:
+        next_cursor = None
+
+        if len(books) > limit:
+            books = books[:limit]
+            last = books[-1]
+            next_cursor = encode_cursor(
+                sort, getattr(last, SORT_FIELDS[sort]), last.uid
+            )
+
+        return {"books": books, "next_cursor": next_cursor}
+
+    def filter_books(
+        self,
+        statement,
+        tags: Iterable[str] = (),
+        language: Optional[str] = None,
+        publisher: Optional[str] = None,
+    ):
+        """Restrict a books query to books carrying every tag and the given fields"""
+
+        for name in dict.fromkeys(tags):
+            statement = statement.where(
+                select(BookTag.book_id)
+                .join(Tag, Tag.uid == BookTag.tag_id)
+                .where(BookTag.book_id == Book.uid, Tag.name == name)
+                .exists()
+            )
+
+        if language is not None:
+            statement = statement.where(Book.language == language)
+
+        if publisher is not None:
+            statement = statement.where(Book.publisher == publisher)
+
+        return statement
+
+    async def get_all_books(
+        self,
+        session: AsyncSession,
+        limit: int = DEFAULT_PAGE_SIZE,
+        cursor: Optional[str] = None,
+        sort: str = "created_at",
+        tags: Iterable[str] = (),
+        language: Optional[str] = None,
+        publisher: Optional[str] = None,
+    ):
+        statement = self.paginate(
+            self.filter_books(
+                select(Book).options(*BOOK_OPTIONS), tags, language, publisher
+            ),
+            limit,
+            cursor,
+            sort,
+        )
+
+        result = await session.exec(statement)
+        page = self.build_page(result.all(), limit, sort)
+
+        if cursor is None:
+            page["facets"] = await self.get_book_facets(
+                session, tags, language, publisher
+            )
+
+        return page
+
+    async def get_book_facets(
+        self,
+        session: AsyncSession,
+        tags: Iterable[str] = (),
+        language: Optional[str] = None,
+        publisher: Optional[str] = None,
+    ) -> dict:
+        """Tag, language and publisher counts of the filtered books in one query"""
+
+        books = self.filter_books(
+            select(Book.uid, Book.language, Book.publisher), tags, language, publisher
+        ).subquery()
+
+        # one GROUPING SETS query, grouping() tells which facet a row counts
+        statement = (
+            select(
+                func.grouping(Tag.name, books.c.language, books.c.publisher),
+                func.coalesce(Tag.name, books.c.language, books.c.publisher),
+                func.count(distinct(books.c.uid)),
+            )
+            .select_from(books)
+            .outerjoin(BookTag, BookTag.book_id == books.c.uid)
+            .outerjoin(Tag, Tag.uid == BookTag.tag_id)
+            .group_by(func.grouping_sets(Tag.name, books.c.language, books.c.publisher))
+        )
 
         result = await session.exec(statement)
 
-        return result.all()
+        return self.build_facets(result.all())
+
+    def build_facets(self, rows: Iterable[tuple[int, Optional[str], int]]) -> dict:
+        # grouping() sets a bit for every column left out of the row's set
+        facets = {0b011: [], 0b101: [], 0b110: []}
+
+        for grouping, value, count in rows:
+            # untagged books group under a NULL tag name
+            if value is not None:
+                facets[grouping].append({"value": value, "count": count})
+
+        for counts in facets.values():
+            counts.sort(key=lambda facet: (-facet["count"], facet["value"]))
+            del counts[MAX_FACET_VALUES:]
+
+        return {
+            "tags": facets[0b011],
+            "language": facets[0b101],
+            "publisher": facets[0b110],
+        }
 
-    async def get_user_books(self, user_uid: str, session: AsyncSession):
+    async def search_books(
+        self,
+        q: str,
+        session: AsyncSession,
+        limit: int = DEFAULT_PAGE_SIZE,
+        cursor: Optional[str] = None,
+        language: Optional[str] = None,
+    ):
+        """Full text search over title, author and publisher ranked by ts_rank"""
+
+        configs = search_configs(language)
+        search_vector = Book.__table__.c.search_vector
+
+        # parsed once per config so every stemming language can match
+        query = func.websearch_to_tsquery(cast(configs[0], REGCONFIG), q)
+        for config in configs[1:]:
+            query = query.op("||")(
+                func.websearch_to_tsquery(cast(config, REGCONFIG), q)
+            )
+
+        rank = func.ts_rank(search_vector, query)
         statement = (
-            select(Book)
-            .where(Book.user_uid == user_uid)
-            .order_by(desc(Book.created_at))
+            select(Book, rank)
+            .where(search_vector.op("@@")(query))
+            .options(*BOOK_OPTIONS)
+        )
+
+        if language is not None:
+            statement = statement.where(
+                func.books_search_config(Book.language) == cast(configs[0], REGCONFIG)
+            )
+
+        if cursor is not None:
+            key, uid = decode_cursor(cursor, "relevance")
+            statement = statement.where(tuple_(rank, Book.uid) < tuple_(key, uid))
+
+        statement = statement.order_by(desc(rank), desc(Book.uid)).limit(limit + 1)
+
+        result = await session.exec(statement)
+        rows = result.all()
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            book, book_rank = rows[-1]
+            next_cursor = encode_cursor("relevance", book_rank, book.uid)
+
+        return {"books": [book for book, _ in rows], "next_cursor": next_cursor}
+
+    async def get_user_books(
+        self,
+        user_uid: str,
+        session: AsyncSession,
+        limit: int = DEFAULT_PAGE_SIZE,
+        cursor: Optional[str] = None,
+    ):
+        statement = self.paginate(
+            select(Book).where(Book.user_uid == user_uid).options(*BOOK_OPTIONS),
+            limit,
+            cursor,
+        )
+
+        result = await session.exec(statement)
+
+        return self.build_page(result.all(), limit)
+
+    async def get_book_version(self, book_uid: str, session: AsyncSession):
+        """(updated_at, digest of tag uids, last tag change) of a book, None if
+        missing
+
+        Review writes update the book's aggregates and so its updated_at, tag
+        links do not, swapping one tag for an older one only changes the digest.
+        """
+
+        tags = (
+            select(BookTag.tag_id, Tag.updated_at)
+            .join(Tag, Tag.uid == BookTag.tag_id)
+            .where(BookTag.book_id == book_uid)
+            .subquery()
+        )
+        tag_uids = func.string_agg(
+            cast(tags.c.tag_id, Text), aggregate_order_by(literal(","), tags.c.tag_id)
         )
+        statement = select(
+            Book.updated_at,
+            select(func.md5(tag_uids)).scalar_subquery(),
+            select(func.max(tags.c.updated_at)).scalar_subquery(),
+        ).where(Book.uid == book_uid)
 
         result = await session.exec(statement)
 
-        return result.all()
+        return result.first()
 
-    async def get_book(self, book_uid: str, session: AsyncSession):
-        statement = select(Book).where(Book.uid == book_uid)
+    async def get_book(self, book_uid: str, session: AsyncSession, options=()):
+        statement = select(Book).where(Book.uid == book_uid).options(*options)
 
         result = await session.exec(statement)
 
@@ -40,35 +281,186 @@ class BookService:
         new_book = Book(**book_data_dict)
 
         new_book.user_uid = user_uid
+        # a new book has no tags, mark the collection loaded for serialization
+        new_book.tags = []
 
         session.add(new_book)
 
         await session.commit()
 
+        autocomplete.add_book(new_book)
+
         return new_book
 
     async def update_book(
         self, book_uid: str, update_data: BookUpdateModal, session: AsyncSession
     ):
-        book_to_update = await self.get_book(book_uid, session)
+        book_to_update = await self.get_book(book_uid, session, options=BOOK_OPTIONS)
 
         if book_to_update is not None:
             update_data_dict = update_data.model_dump()
+            title, author = book_to_update.title, book_to_update.author
 
             for k, v in update_data_dict.items():
                 setattr(book_to_update, k, v)
 
             await session.commit()
 
+            autocomplete.remove("title", title, book_to_update.uid)
+            autocomplete.remove("author", author, book_to_update.uid)
+            autocomplete.add_book(book_to_update)
+
             return book_to_update
         else:
             return None
 
+    async def import_books(
+        self,
+        rows: AsyncIterable[tuple[int, dict | None]],
+        user_uid: str,
+        session: AsyncSession,
+    ) -> dict:
+        """Validate rows in chunks and load them with COPY through a staging table
+
+        The import is all or nothing, an unreadable file or a database error
+        rolls back the chunks already copied.
+        """
+
+        start = time.perf_counter()
+
+        try:
+            imported, failed, errors = await self._copy_rows(rows, user_uid, session)
+            await session.commit()
+        except InvalidImportFile:
+            await session.rollback()
+            raise
+        except (
+            DBAPIError,
+            asyncpg.PostgresError,
+            asyncpg.InterfaceError,
+            # raised unwrapped by copy_records_to_table, e.g. int32 overflow
+            OverflowError,
+        ) as e:
+            await session.rollback()
+            logging.exception("book import failed")
+            raise BookImportFailed() from e
+
+        if imported:
+            autocomplete.request_rebuild()
+
+        seconds = time.perf_counter() - start
+
+        return {
+            "imported": imported,
+            "failed": failed,
+            "errors": errors,
+            "seconds": seconds,
+            "rows_per_second": (imported + failed) / seconds if seconds else 0,
+        }
+
+    async def _copy_rows(
+        self,
+        rows: AsyncIterable[tuple[int, dict | None]],
+        user_uid: str,
+        session: AsyncSession,
+    ) -> tuple[int, int, list[dict]]:
+        imported = failed = 0
+        errors = []
+        chunk = []
+
+        # the temp table lives on this connection until the import commits
+        await session.execute(
+            text(
+                "CREATE TEMP TABLE books_import ("
+                "uid uuid, title varchar, author varchar, publisher varchar, "
+                "published_date date, page_count integer, language varchar, "
+                "user_uid uuid, created_at timestamp, updated_at timestamp"
+                ") ON COMMIT DROP"
+            )
+        )
+        connection = await session.connection()
+        raw_connection = await connection.get_raw_connection()
+        driver_connection = raw_connection.driver_connection
+
+        async def copy_chunk():
+            await driver_connection.copy_records_to_table(
+                "books_import", records=chunk, columns=BOOK_COLUMNS
+            )
+            columns = ", ".join(BOOK_COLUMNS)
+            await session.execute(
+                text(
+                    f"INSERT INTO books ({columns}) SELECT {columns} FROM books_import"
+                )
+            )
+            await session.execute(text("TRUNCATE books_import"))
+
+        async for row_num, row in rows:
+            try:
+                if row is None:
+                    raise ValueError("row is not valid json")
+
+                book = BookImportRow.model_validate(row)
+
+            except (ValidationError, ValueError) as e:
+                failed += 1
+
+                if len(errors) < MAX_IMPORT_ERRORS:
+                    if isinstance(e, ValidationError):
+                        messages = [
+                            f"{'.'.join(map(str, error['loc'])) or 'row'}: {error['msg']}"
+                            for error in e.errors()
+                        ]
+                    else:
+                        messages = [str(e)]
+
+                    errors.append({"row": row_num, "errors": messages})
+                continue
+
+            now = datetime.now()
+            chunk.append(
+                (
+                    uuid.uuid4(),
+                    book.title,
+                    book.author,
+                    book.publisher,
+                    book.published_date,
+                    book.page_count,
+                    book.language,
+                    uuid.UUID(user_uid),
+                    now,
+                    now,
+                )
+            )
+
+            if len(chunk) >= IMPORT_CHUNK_SIZE:
+                await copy_chunk()
+                imported += len(chunk)
+                chunk = []
+
+        if chunk:
+            await copy_chunk()
+            imported += len(chunk)
+
+        return imported, failed, errors
+
+    async def export_books(self, updated_since: Optional[datetime] = None):
+        """Stream every book as NDJSON"""
+
+        statement = select(*(Book.__table__.c[name] for name in BOOK_COLUMNS))
+
+        if updated_since is not None:
+            statement = statement.where(Book.updated_at >= naive_utc(updated_since))
+
+        return await stream_ndjson(statement)
+
     async def delete_book(self, book_uid: str, session: AsyncSession):
-        book_to_delete = await self.get_book(book_uid, session)
+        book_to_delete = await self.get_book(
+            book_uid, session, options=BOOK_DELETE_OPTIONS
+        )
         if book_to_delete is not None:
             await session.delete(book_to_delete)
             await session.commit()
+            autocomplete.remove_book(book_to_delete)
             return book_to_delete
         else:
             return None
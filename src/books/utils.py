@@ -0,0 +1,143 @@
+from datetime import datetime
+from typing import AsyncIterator, BinaryIO, Iterator
+from src.errors import InvalidCursor, InvalidImportFile
+import asyncio
+import base64
+import csv
+import io
+import itertools
+import json
+import uuid
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+# listing sort orders and the Book attribute each one pages on, uid breaks ties
+SORT_FIELDS = {"created_at": "created_at", "rating": "rating_avg"}
+
+# most common values returned per facet on the books listing
+MAX_FACET_VALUES = 20
+
+# Book.language (code or name) to postgres text search config, anything else
+# is indexed with "simple". Mirrors books_search_config() in the migrations.
+SEARCH_CONFIGS = {
+    "da": "danish",
+    "de": "german",
+    "en": "english",
+    "es": "spanish",
+    "fi": "finnish",
+    "fr": "french",
+    "hu": "hungarian",
+    "it": "italian",
+    "nl": "dutch",
+    "no": "norwegian",
+    "pt": "portuguese",
+    "ro": "romanian",
+    "ru": "russian",
+    "sv": "swedish",
+    "tr": "turkish",
+}
+
+
+def search_configs(language: str | None = None) -> list[str]:
+    """Text search configs a query must be parsed with to match `language`,
+    or every book when no language is given"""
+
+    if language is not None:
+        language = language.lower()
+
+        if language in SEARCH_CONFIGS.values():
+            return [language]
+
+        return [SEARCH_CONFIGS.get(language, "simple")]
+
+    return sorted(set(SEARCH_CONFIGS.values())) + ["simple"]
+
+
+# rows validated and copied per round trip during a bulk import
+IMPORT_CHUNK_SIZE = 5000
+# row errors kept in the import report, the rest are only counted
+MAX_IMPORT_ERRORS = 1000
+
+
+def encode_cursor(sort: str, key: datetime | float, uid: uuid.UUID) -> str:
+    """Build an opaque cursor pointing at the last book of a page"""
+
+    if isinstance(key, datetime):
+        key = key.isoformat()
+
+    payload = json.dumps([sort, key, str(uid)])
+
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort: str) -> tuple[datetime | float, uuid.UUID]:
+    """Turn a cursor from `encode_cursor` back into its (key, uid) for `sort`"""
+
+    try:
+        padding = "=" * (-len(cursor) % 4)
+        cursor_sort, key, uid = json.loads(base64.urlsafe_b64decode(cursor + padding))
+
+        if cursor_sort != sort:
+            raise ValueError("cursor belongs to another sort order")
+
+        if sort == "created_at":
+            key = datetime.fromisoformat(key)
+        else:
+            key = float(key)
+
+        return key, uuid.UUID(uid)
+
+    except (ValueError, TypeError):
+        raise InvalidCursor()
+
+
+def iter_import_rows(file: BinaryIO, format: str) -> Iterator[tuple[int, dict | None]]:
+    """Yield (line number, row) from a csv or ndjson upload one line at a time
+
+    Rows that cannot be parsed are yielded as None, a file that is not UTF-8
+    raises InvalidImportFile.
+    """
+    text = io.TextIOWrapper(file, encoding="utf-8", newline="")
+
+    try:
+        yield from _iter_rows(text, format)
+    except UnicodeDecodeError:
+        # the decoder can't resume past a bad byte, reject the whole file
+        raise InvalidImportFile()
+    finally:
+        # leave the upload open for its owner
+        text.detach()
+
+
+async def aiter_import_rows(
+    file: BinaryIO, format: str
+) -> AsyncIterator[tuple[int, dict | None]]:
+    """`iter_import_rows` with the blocking reads run in a thread, a chunk of
+    rows at a time"""
+    rows = iter_import_rows(file, format)
+
+    while batch := await asyncio.to_thread(
+        list, itertools.islice(rows, IMPORT_CHUNK_SIZE)
+    ):
+        for row in batch:
+            yield row
+
+
+def _iter_rows(
+    text: io.TextIOWrapper, format: str
+) -> Iterator[tuple[int, dict | None]]:
+    if format == "csv":
+        reader = csv.DictReader(text)
+
+        for row in reader:
+            yield reader.line_num, row
+    else:
+        for line_num, line in enumerate(text, start=1):
+            if not line.strip():
+                continue
+
+            try:
+                yield line_num, json.loads(line)
+            except ValueError:
+                yield line_num, None
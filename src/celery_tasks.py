@@ -1,15 +1,205 @@
-from celery import Celery
-from .mail import crate_message, mail
-from asgiref.sync import async_to_sync
+from celery import Celery, Task, group
+from celery.signals import worker_process_shutdown
+from celery.utils.log import get_task_logger
+from .mail import build_message, smtp_pool
+from .metrics import CELERY_ENQUEUE_SECONDS
+from .config import Config
+import redis
+import smtplib
+import uuid
 
-c_app = Celery()
+logger = get_task_logger(__name__)
+
+
+class TimedTask(Task):
+    def apply_async(self, *args, **kwargs):
+        # delay() publishes synchronously, this is the time the caller is blocked
+        with CELERY_ENQUEUE_SECONDS.labels(self.name).time():
+            return super().apply_async(*args, **kwargs)
+
+
+c_app = Celery(task_cls=TimedTask)
 
 c_app.config_from_object("src.config")
 
+# emails already handed to SMTP, keyed by outbox row uid or bulk job and address
+sent_emails = redis.Redis.from_url(Config.REDIS_URL)
+SENT_EMAIL_TTL = 86400
+# held while an email is being sent, a worker dying mid-send only blocks a
+# redelivery for this long
+SENDING_LOCK_TTL = 300
+
+
+@worker_process_shutdown.connect
+def close_smtp_connections(**kwargs):
+    smtp_pool.close()
+
+
+def log_sent(count: int, rate: float):
+    logger.info(
+        "sent %d email(s) at %.1f/s, %d sent at %.1f/s over %d connection(s)",
+        count,
+        rate,
+        smtp_pool.sent,
+        smtp_pool.rate,
+        smtp_pool.connects,
+    )
+
+
+def mark_sent(dedup_key: str) -> None:
+    try:
+        sent_emails.pipeline().set(
+            f"email_sent:{dedup_key}", 1, ex=SENT_EMAIL_TTL
+        ).delete(f"email_sending:{dedup_key}").execute()
+    except redis.RedisError:
+        # the lock expires and a redelivery may send it again
+        logger.exception("could not mark email %s sent", dedup_key)
+
+
+def deliver(emails: list) -> list:
+    """Send (recipients, subject, body, dedup_key) emails over one connection
+
+    Emails already sent are skipped, those another worker is sending right now
+    are returned so the caller can retry them once its lock expires. An email
+    the server permanently refuses is logged and marked sent so a retry of the
+    batch doesn't stop at it again.
+    """
+    keys = []
+    messages = []
+    busy = []
+
+    for email in emails:
+        recipients, subject, body, dedup_key = email
+        if dedup_key:
+            try:
+                if sent_emails.exists(f"email_sent:{dedup_key}"):
+                    logger.info("skipped duplicate email %s", dedup_key)
+                    continue
+                if not sent_emails.set(
+                    f"email_sending:{dedup_key}", 1, nx=True, ex=SENDING_LOCK_TTL
+                ):
+                    busy.append(email)
+                    continue
+            except redis.RedisError:
+                # sending without the lock risks a duplicate, not a lost email
+                logger.exception("could not lock email %s", dedup_key)
+        keys.append(dedup_key)
+        messages.append(build_message(recipients, subject, body))
+
+    if not messages:
+        return busy
+
+    done = []
+    rejected = []
+
+    def on_sent(i: int) -> None:
+        done.append(i)
+        if keys[i]:
+            mark_sent(keys[i])
+
+    def on_rejected(i: int, exc: smtplib.SMTPException) -> None:
+        rejected.append(i)
+        logger.error("email %s to %s rejected: %r", keys[i], messages[i]["To"], exc)
+        on_sent(i)
+
+    try:
+        rate = smtp_pool.send(messages, on_sent=on_sent, on_rejected=on_rejected)
+    except Exception:
+        # let the retry send the rest, the ones done are marked sent
+        unsent = [f"email_sending:{key}" for key in keys[len(done) :] if key]
+        if unsent:
+            try:
+                sent_emails.delete(*unsent)
+            except redis.RedisError:
+                # the locks expire, keep the SMTP error as the one raised
+                logger.exception("could not release %d email lock(s)", len(unsent))
+        raise
+    log_sent(len(done) - len(rejected), rate)
+    return busy
+
+
+# nobody reads the return value, storing it would cost a Redis write per email.
+# Acked after sending, a worker that dies mid-send has the task redelivered
+@c_app.task(
+    bind=True,
+    ignore_result=True,
+    acks_late=True,
+    reject_on_worker_lost=True,
+    autoretry_for=(smtplib.SMTPException, OSError),
+    retry_backoff=True,
+    max_retries=5,
+)
+def send_email(
+    self,
+    recipients: list[str],
+    subject: str,
+    body: str,
+    dedup_key: str | None = None,
+):
+    if deliver([(recipients, subject, body, dedup_key)]):
+        raise self.retry(countdown=SENDING_LOCK_TTL)
+
+
+@c_app.task(
+    bind=True,
+    ignore_result=True,
+    acks_late=True,
+    reject_on_worker_lost=True,
+    autoretry_for=(smtplib.SMTPException, OSError),
+    retry_backoff=True,
+    max_retries=5,
+)
+def send_emails(self, emails: list):
+    """Send a batch of outbox emails over one pooled connection"""
+    busy = deliver(emails)
+    if busy:
+        raise self.retry(args=(busy,), countdown=SENDING_LOCK_TTL)
+
+
+def chunked(items: list[str], size: int) -> list[list[str]]:
+    return [items[i : i + size] for i in range(0, len(items), size)]
+
+
+@c_app.task(bind=True, ignore_result=True)
+def send_bulk_email(self, recipients: list[str], subject: str, body: str):
+    """Split a bulk send into chunks that workers on the bulk queue share"""
+    chunks = chunked(recipients, Config.BULK_EMAIL_CHUNK_SIZE)
+    # with the address, the dedup key of every message in the job
+    job_id = self.request.id or str(uuid.uuid4())
+
+    group(
+        send_email_chunk.s(chunk, subject, body, job_id) for chunk in chunks
+    ).apply_async()
+    logger.info("queued %d recipient(s) in %d chunk(s)", len(recipients), len(chunks))
 
-@c_app.task()
-def send_email(recipients: list[str], subject: str, body: str):
-    message = crate_message(recipients, subject, body)
 
-    async_to_sync(mail.send_message)(message)
-    print("Email sent")
+@c_app.task(
+    bind=True,
+    ignore_result=True,
+    rate_limit=Config.BULK_EMAIL_RATE_LIMIT,
+    acks_late=True,
+    reject_on_worker_lost=True,
+    autoretry_for=(smtplib.SMTPException, OSError),
+    retry_backoff=True,
+    max_retries=5,
+)
+def send_email_chunk(
+    self,
+    recipients: list[str],
+    subject: str,
+    body: str,
+    job_id: str | None = None,
+):
+    # one message per recipient so addresses aren't disclosed to each other,
+    # a retry skips the recipients already sent
+    busy = deliver(
+        [
+            ([recipient], subject, body, job_id and f"{job_id}:{recipient}")
+            for recipient in recipients
+        ]
+    )
+    if busy:
+        raise self.retry(
+            args=([email[0][0] for email in busy], subject, body, job_id),
+            countdown=SENDING_LOCK_TTL,
+        )
@@ -1,8 +1,19 @@
 from pydantic_settings import BaseSettings, SettingsConfigDict
+from typing import Literal
+from kombu import Exchange, Queue
 
 
 class Settings(BaseSettings):
     DATABASE_URL: str
+    # per worker, total connections = workers * (pool size + max overflow)
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    # asyncpg prepared statement cache, set to 0 behind pgbouncer
+    DB_STATEMENT_CACHE_SIZE: int = 100
+    DB_SERVER_SETTINGS: dict[str, str] = {"application_name": "bookly"}
     JWT_SECRET: str
     JWT_ALGORITHM: str
     REDIS_URL: str = "redis://localhost:6379/0"
@@ -17,6 +28,60 @@ class Settings(BaseSettings):
     USE_CREDENTIALS: bool = True
     VALIDATE_CERTS: bool = True
     DOMAIN: str
+    # authorize RoleChecker from access token claims instead of the users table
+    AUTH_CLAIMS_ONLY: bool = False
+    # verified access/refresh tokens kept per process to skip signature checks
+    TOKEN_CACHE_SIZE: int = 10000
+    # keep a local copy of the jti blocklist in every worker
+    BLOCKLIST_MIRROR: bool = True
+    # ask Redis directly while the local copy is still bootstrapping
+    BLOCKLIST_FALLBACK_TO_REDIS: bool = True
+    # processes used for bcrypt, defaults to the number of cpus
+    PASSWORD_HASH_WORKERS: int | None = None
+    # hashes allowed to wait for a free process before answering 503
+    PASSWORD_HASH_QUEUE_LIMIT: int = 64
+    # full rebuild of the autocomplete index, writes from other workers lag by this
+    AUTOCOMPLETE_REFRESH_SECONDS: float = 600
+    # answer prefix misses with pg_trgm similarity matches
+    AUTOCOMPLETE_FUZZY: bool = True
+    # max-age sent with ETag/Last-Modified, 0 makes clients revalidate every time
+    HTTP_CACHE_MAX_AGE: int = 0
+    # fraction of successful requests written to the access log
+    ACCESS_LOG_SAMPLE_RATE: float = 1.0
+    # requests at least this slow are always logged, like errors
+    ACCESS_LOG_SLOW_MS: float = 1000
+    # entries waiting for the writer thread before new ones are dropped
+    ACCESS_LOG_QUEUE_SIZE: int = 10000
+    # dev/test only: group each request's SQL to catch N+1s and blown budgets
+    QUERY_DEBUG: bool = False
+    # "warn" logs, "raise" fails the request so tests catch the regression
+    QUERY_BUDGET_ACTION: Literal["warn", "raise"] = "warn"
+    # one statement shape repeated this often in a request is flagged as N+1
+    QUERY_REPEAT_THRESHOLD: int = 3
+    RATE_LIMIT_ENABLED: bool = True
+    # login, signup, password reset and send-email, per client and route
+    AUTH_RATE_LIMIT_PER_MINUTE: int = 10
+    AUTH_RATE_LIMIT_BURST: int = 5
+    # creates, updates and deletes on books, reviews and tags
+    WRITE_RATE_LIMIT_PER_MINUTE: int = 120
+    WRITE_RATE_LIMIT_BURST: int = 30
+    # write tokens taken per Redis call and spent locally for up to a second
+    WRITE_RATE_LIMIT_LEASE: int = 5
+    # SMTP connections each worker process keeps open between tasks
+    SMTP_POOL_SIZE: int = 1
+    # idle connections older than this are checked with NOOP before reuse
+    SMTP_KEEPALIVE_SECONDS: float = 30
+    SMTP_TIMEOUT: float = 30
+    # recipients per bulk email task, each task reuses one SMTP connection
+    BULK_EMAIL_CHUNK_SIZE: int = 50
+    # bulk chunks each worker starts, in Celery's rate_limit format
+    BULK_EMAIL_RATE_LIMIT: str = "60/m"
+    # outbox rows published per transaction
+    OUTBOX_BATCH_SIZE: int = 100
+    # commits wake the local dispatcher, polling picks up retries and rows
+    # committed by other processes
+    OUTBOX_POLL_SECONDS: float = 5
+    OUTBOX_MAX_BACKOFF_SECONDS: float = 300
 
     model_config = SettingsConfigDict(env_file=".env", extra="ignore")
 
@@ -26,3 +91,23 @@ Config = Settings()
 
 broker_url = Config.REDIS_URL
 result_backend = Config.REDIS_URL
+
+# verification and password reset mail never waits behind a bulk send. A
+# worker started without -Q consumes these in order, "celery" drains tasks
+# queued before the split; -Q bulk or -Q transactional dedicates a worker
+task_queues = tuple(
+    Queue(name, Exchange(name), routing_key=name)
+    for name in ("transactional", "bulk", "celery")
+)
+task_default_queue = "transactional"
+task_routes = {
+    "src.celery_tasks.send_email": {"queue": "transactional"},
+    "src.celery_tasks.send_emails": {"queue": "transactional"},
+    "src.celery_tasks.send_bulk_email": {"queue": "bulk"},
+    "src.celery_tasks.send_email_chunk": {"queue": "bulk"},
+}
+# drain queues in the order listed instead of round robin
+broker_transport_options = {"queue_order_strategy": "priority"}
+# a worker reserves one task at a time, so transactional mail published
+# during a bulk send isn't stuck behind bulk chunks it already prefetched
+worker_prefetch_multiplier = 1
@@ -0,0 +1,59 @@
+from datetime import datetime, timezone
+from typing import AsyncIterator
+from .main import Session
+import json
+
+# rows fetched per round trip from the server-side cursor
+EXPORT_BATCH_SIZE = 1000
+
+
+def json_default(value):
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+
+    return str(value)
+
+
+def naive_utc(value: datetime | None) -> datetime | None:
+    """Compare client timestamps with the naive UTC ones in the database"""
+    if value is None or value.tzinfo is None:
+        return value
+
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def to_ndjson(rows) -> str:
+    return "".join(json.dumps(dict(row), default=json_default) + "\n" for row in rows)
+
+
+async def stream_ndjson(statement) -> AsyncIterator[str]:
+    """Run a core select and return its rows as NDJSON from a server-side cursor
+
+    The statement runs and the first batch is fetched before this returns, so
+    database errors are raised while the route can still send an error status.
+    The stream has its own session, closed once the stream ends.
+    """
+    session = Session()
+
+    try:
+        result = await session.stream(
+            statement.execution_options(yield_per=EXPORT_BATCH_SIZE)
+        )
+        batches = result.mappings().partitions()
+        first = await anext(batches, None)
+    except BaseException:
+        await session.close()
+        raise
+
+    return _stream_batches(session, first, batches)
+
+
+async def _stream_batches(session, first, batches) -> AsyncIterator[str]:
+    try:
+        if first is not None:
+            yield to_ndjson(first)
+
+            async for rows in batches:
+                yield to_ndjson(rows)
+    finally:
+        await session.close()
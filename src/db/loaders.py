@@ -0,0 +1,21 @@
+from sqlalchemy.orm import selectinload
+from .models import User, Book, Tag
+
+# Relationships on the models are `raise_on_sql`, nothing is loaded unless a
+# service asks for it. Each tuple matches the response shape that serializes it.
+
+# `Book` schema, used by listings and write endpoints
+BOOK_OPTIONS = (selectinload(Book.tags),)
+
+# `BookDetailModal`, GET /books/{book_uid}
+BOOK_DETAIL_OPTIONS = (selectinload(Book.reviews), selectinload(Book.tags))
+
+# `UserBooksModel`, GET /auth/me
+USER_DETAIL_OPTIONS = (
+    selectinload(User.books).selectinload(Book.tags),
+    selectinload(User.reviews),
+)
+
+# everything the unit of work touches when a row with links is deleted
+BOOK_DELETE_OPTIONS = BOOK_DETAIL_OPTIONS
+TAG_DELETE_OPTIONS = (selectinload(Tag.books),)
@@ -1,10 +1,75 @@
-from sqlmodel import create_engine, text, SQLModel
+from sqlmodel import text, SQLModel
 from sqlmodel.ext.asyncio.session import AsyncSession
-from sqlalchemy.ext.asyncio import AsyncEngine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from src.config import Config
+from src.metrics import instrument_engine, stats_collector
+import time
 
-async_engine = AsyncEngine(create_engine(url=Config.DATABASE_URL))
+
+class PoolStats:
+    """Time spent waiting for a pooled connection, used to size the pool"""
+
+    def __init__(self) -> None:
+        self.checkouts = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    def record_wait(self, seconds: float) -> None:
+        self.checkouts += 1
+        self.wait_seconds += seconds
+        self.max_wait_seconds = max(self.max_wait_seconds, seconds)
+
+
+pool_stats = PoolStats()
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    def _do_get(self):
+        start = time.perf_counter()
+
+        try:
+            return super()._do_get()
+        finally:
+            pool_stats.record_wait(time.perf_counter() - start)
+
+
+async_engine = create_async_engine(
+    url=Config.DATABASE_URL,
+    poolclass=TimedQueuePool,
+    pool_size=Config.DB_POOL_SIZE,
+    max_overflow=Config.DB_MAX_OVERFLOW,
+    pool_timeout=Config.DB_POOL_TIMEOUT,
+    pool_recycle=Config.DB_POOL_RECYCLE,
+    pool_pre_ping=Config.DB_POOL_PRE_PING,
+    connect_args={
+        "statement_cache_size": Config.DB_STATEMENT_CACHE_SIZE,
+        "server_settings": Config.DB_SERVER_SETTINGS,
+    },
+)
+
+instrument_engine(async_engine.sync_engine)
+
+Session = async_sessionmaker(
+    bind=async_engine, class_=AsyncSession, expire_on_commit=False
+)
+
+
+def get_pool_status() -> dict:
+    pool = async_engine.pool
+
+    return {
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "checked_in": pool.checkedin(),
+        "overflow": pool.overflow(),
+        "checkouts": pool_stats.checkouts,
+        "wait_seconds": pool_stats.wait_seconds,
+        "max_wait_seconds": pool_stats.max_wait_seconds,
+    }
+
+
+stats_collector.add("db_pool", get_pool_status)
 
 
 async def init_db():
@@ -18,10 +83,5 @@ async def init_db():
 
 
 async def get_session() -> AsyncSession:
-
-    Session = sessionmaker(
-        bind=async_engine, class_=AsyncSession, expire_on_commit=False
-    )
-
     async with Session() as session:
         yield session
@@ -1,16 +1,17 @@
 from sqlmodel import SQLModel, Field, Column, Relationship
+from sqlalchemy import Computed, Index
 import sqlalchemy.dialects.postgresql as pg
 from datetime import datetime, date
 from typing import List, Optional
 import uuid
 
+# relationships are never loaded implicitly, see src/db/loaders.py
+
 
 class User(SQLModel, table=True):
     __tablename__ = "users"
     uid: uuid.UUID = Field(
-        sa_column=Column(
-            pg.UUID, nullable=False, primary_key=True, default=uuid.uuid4()
-        )
+        sa_column=Column(pg.UUID, nullable=False, primary_key=True, default=uuid.uuid4)
     )
     username: str
     email: str
@@ -26,10 +27,10 @@ class User(SQLModel, table=True):
         sa_column=Column(pg.TIMESTAMP, default=datetime.now, onupdate=datetime.now)
     )
     books: List["Book"] = Relationship(
-        back_populates="user", sa_relationship_kwargs={"lazy": "selectin"}
+        back_populates="user", sa_relationship_kwargs={"lazy": "raise_on_sql"}
     )
     reviews: List["Review"] = Relationship(
-        back_populates="user", sa_relationship_kwargs={"lazy": "selectin"}
+        back_populates="user", sa_relationship_kwargs={"lazy": "raise_on_sql"}
     )
 
     def __repr__(self):
@@ -37,21 +38,37 @@ class User(SQLModel, table=True):
 
 
 class BookTag(SQLModel, table=True):
+    # the primary key covers book -> tags, this one tag -> books for ?tag= filters
+    __table_args__ = (Index("ix_booktag_tag_id_book_id", "tag_id", "book_id"),)
     book_id: uuid.UUID = Field(default=None, foreign_key="books.uid", primary_key=True)
     tag_id: uuid.UUID = Field(default=None, foreign_key="tags.uid", primary_key=True)
 
 
 class Tag(SQLModel, table=True):
     __tablename__ = "tags"
+    __table_args__ = (
+        # conflict target for TagService.get_or_create_tag_uids
+        Index("ix_tags_name", "name", unique=True),
+        # autocomplete fuzzy fallback
+        Index(
+            "ix_tags_name_trgm",
+            "name",
+            postgresql_using="gin",
+            postgresql_ops={"name": "gin_trgm_ops"},
+        ),
+    )
     uid: uuid.UUID = Field(
         sa_column=Column(pg.UUID, nullable=False, primary_key=True, default=uuid.uuid4)
     )
     name: str = Field(sa_column=Column(pg.VARCHAR, nullable=False))
     created_at: datetime = Field(sa_column=Column(pg.TIMESTAMP, default=datetime.now))
+    updated_at: datetime = Field(
+        sa_column=Column(pg.TIMESTAMP, default=datetime.now, onupdate=datetime.now)
+    )
     books: List["Book"] = Relationship(
         link_model=BookTag,
         back_populates="tags",
-        sa_relationship_kwargs={"lazy": "selectin"},
+        sa_relationship_kwargs={"lazy": "raise_on_sql"},
     )
 
     def __repr__(self) -> str:
@@ -60,10 +77,37 @@ class Tag(SQLModel, table=True):
 
 class Book(SQLModel, table=True):
     __tablename__ = "books"
+    __table_args__ = (
+        # keyset pagination indexes, see BookService.paginate
+        Index("ix_books_created_at_uid", "created_at", "uid"),
+        Index("ix_books_user_uid_created_at_uid", "user_uid", "created_at", "uid"),
+        # incremental exports, see BookService.export_books
+        Index("ix_books_updated_at", "updated_at"),
+        # GET /books?sort=rating
+        Index("ix_books_rating_avg_uid", "rating_avg", "uid"),
+        # GET /books?language=...&publisher=...
+        Index("ix_books_language", "language"),
+        Index("ix_books_publisher", "publisher"),
+        # GET /books/search
+        Index("ix_books_search_vector", "search_vector", postgresql_using="gin"),
+        # autocomplete fuzzy fallback
+        Index(
+            "ix_books_title_trgm",
+            "title",
+            postgresql_using="gin",
+            postgresql_ops={"title": "gin_trgm_ops"},
+        ),
+        Index(
+            "ix_books_author_trgm",
+            "author",
+            postgresql_using="gin",
+            postgresql_ops={"author": "gin_trgm_ops"},
+        ),
+    )
+    # search_vector is only read in sql, never load it with the row
+    __mapper_args__ = {"exclude_properties": ["search_vector"]}
     uid: uuid.UUID = Field(
-        sa_column=Column(
-            pg.UUID, nullable=False, primary_key=True, default=uuid.uuid4()
-        )
+        sa_column=Column(pg.UUID, nullable=False, primary_key=True, default=uuid.uuid4)
     )
     title: str
     author: str
@@ -76,14 +120,47 @@ class Book(SQLModel, table=True):
     updated_at: datetime = Field(
         sa_column=Column(pg.TIMESTAMP, default=datetime.now, onupdate=datetime.now)
     )
+    # review aggregates, maintained by ReviewService with every review write
+    review_count: int = Field(
+        default=0, sa_column=Column(pg.INTEGER, nullable=False, server_default="0")
+    )
+    rating_sum: int = Field(
+        default=0, sa_column=Column(pg.INTEGER, nullable=False, server_default="0")
+    )
+    rating_avg: float = Field(
+        default=0,
+        sa_column=Column(pg.DOUBLE_PRECISION, nullable=False, server_default="0"),
+    )
+    rating_histogram: dict = Field(
+        default_factory=dict,
+        sa_column=Column(pg.JSONB, nullable=False, server_default="{}"),
+    )
+    # books_search_config() maps the book language to a text search config,
+    # it is created by the "books full text search" migration
+    search_vector: Optional[str] = Field(
+        default=None,
+        exclude=True,
+        sa_column=Column(
+            pg.TSVECTOR,
+            Computed(
+                "setweight(to_tsvector(books_search_config(language), "
+                "coalesce(title, '')), 'A') || "
+                "setweight(to_tsvector(books_search_config(language), "
+                "coalesce(author, '')), 'B') || "
+                "setweight(to_tsvector(books_search_config(language), "
+                "coalesce(publisher, '')), 'C')",
+                persisted=True,
+            ),
+        ),
+    )
     user: Optional[User] = Relationship(back_populates="books")
     reviews: List["Review"] = Relationship(
-        back_populates="book", sa_relationship_kwargs={"lazy": "selectin"}
+        back_populates="book", sa_relationship_kwargs={"lazy": "raise_on_sql"}
     )
     tags: List[Tag] = Relationship(
         link_model=BookTag,
         back_populates="books",
-        sa_relationship_kwargs={"lazy": "selectin"},
+        sa_relationship_kwargs={"lazy": "raise_on_sql"},
     )
 
     def __repr__(self):
@@ -92,10 +169,9 @@ class Book(SQLModel, table=True):
 
 class Review(SQLModel, table=True):
     __tablename__ = "reviews"
+    __table_args__ = (Index("ix_reviews_updated_at", "updated_at"),)
     uid: uuid.UUID = Field(
-        sa_column=Column(
-            pg.UUID, nullable=False, primary_key=True, default=uuid.uuid4()
-        )
+        sa_column=Column(pg.UUID, nullable=False, primary_key=True, default=uuid.uuid4)
     )
     rating: int = Field(lt=5)
     review_text: str
@@ -110,3 +186,24 @@ class Review(SQLModel, table=True):
 
     def __repr__(self):
         return f"<Review for book {self.book_uid} by  user {self.user_uid}>"
+
+
+class OutboxEmail(SQLModel, table=True):
+    """Email committed with the change that caused it, published by src/outbox.py"""
+
+    __tablename__ = "email_outbox"
+    __table_args__ = (Index("ix_email_outbox_available_at", "available_at"),)
+    uid: uuid.UUID = Field(
+        sa_column=Column(pg.UUID, nullable=False, primary_key=True, default=uuid.uuid4)
+    )
+    recipients: List[str] = Field(
+        sa_column=Column(pg.ARRAY(pg.VARCHAR), nullable=False)
+    )
+    subject: str
+    body: str
+    attempts: int = Field(default=0)
+    last_error: Optional[str] = None
+    available_at: datetime = Field(
+        sa_column=Column(pg.TIMESTAMP, nullable=False, default=datetime.now)
+    )
+    created_at: datetime = Field(sa_column=Column(pg.TIMESTAMP, default=datetime.now))
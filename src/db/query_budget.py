@@ -0,0 +1,64 @@
+from collections import Counter
+from fastapi.requests import Request
+from src.config import Config
+from src.metrics import RequestQueries
+import logging
+import re
+
+_PARAMS = re.compile(r"\$\d+(::[\w\[\]]+)?|%\(\w+\)s|\?")
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(\.\d+)?\b")
+_PARAM_LISTS = re.compile(r"\(\s*\?(\s*,\s*\?)*\s*\)")
+_SPACE = re.compile(r"\s+")
+
+
+class QueryBudgetExceeded(RuntimeError):
+    """A request ran more statements than its budget, or repeated one"""
+
+
+def normalize_sql(statement: str) -> str:
+    """Statement shape, parameters, literals and IN list lengths stripped"""
+
+    statement = _PARAMS.sub("?", statement)
+    statement = _LITERALS.sub("?", statement)
+    statement = _PARAM_LISTS.sub("(?)", statement)
+
+    return _SPACE.sub(" ", statement).strip()
+
+
+class QueryBudget:
+    """Most SQL statements one request may run, checked when QUERY_DEBUG is on
+
+    Add it to a route's or a router's `dependencies`, the route's wins.
+    """
+
+    def __init__(self, limit: int) -> None:
+        self.limit = limit
+
+    def __call__(self, request: Request) -> None:
+        request.state.query_budget = self.limit
+
+
+def check_request_queries(request: Request, route: str, queries: RequestQueries):
+    """Warn or raise, per QUERY_BUDGET_ACTION, on a blown budget or an N+1"""
+
+    statements = Counter()
+    for statement, count in queries.statements.items():
+        statements[normalize_sql(statement)] += count
+
+    problems = [
+        f"statement ran {count} times, possible N+1: {statement}"
+        for statement, count in statements.most_common()
+        if count >= Config.QUERY_REPEAT_THRESHOLD
+    ]
+
+    budget = getattr(request.state, "query_budget", None)
+    if budget is not None and queries.count > budget:
+        problems.insert(0, f"{queries.count} statements over a budget of {budget}")
+
+    if problems:
+        message = f"{request.method} {route}: " + "\n  ".join(problems)
+
+        if Config.QUERY_BUDGET_ACTION == "raise":
+            raise QueryBudgetExceeded(message)
+
+        logging.warning(message)
@@ -1,17 +1,161 @@
 from redis import asyncio as aioredis
+from redis.exceptions import ConnectionError as RedisConnectionError, RedisError
 from src.config import Config
+from src.metrics import REDIS_SECONDS
+import asyncio
+import contextlib
+import logging
+import time
 
 JWT_EXPIRY = 3600
 
+# sorted set of revoked jtis scored by expiry, used to bootstrap the mirrors
+BLOCKLIST_KEY = "jti_blocklist"
+BLOCKLIST_CHANNEL = "jti_blocklist:revoked"
+MIRROR_RETRY_DELAY = 1
+# an idle subscription is pinged this often, and dropped after two silent ones
+MIRROR_PING_INTERVAL = 10
+
 token_block_list = aioredis.from_url(Config.REDIS_URL)
 
+# label children resolved once, timing stays off the dict lookups per call
+redis_blocklist_add = REDIS_SECONDS.labels("blocklist_add")
+redis_blocklist_get = REDIS_SECONDS.labels("blocklist_get")
+redis_token_version_get = REDIS_SECONDS.labels("token_version_get")
+redis_token_version_bump = REDIS_SECONDS.labels("token_version_bump")
+
+
+class BlocklistMirror:
+    """Per-worker copy of the jti blocklist kept in sync over Redis pub/sub"""
+
+    def __init__(self, redis) -> None:
+        self.redis = redis
+        self.warm = False
+        self._jtis: dict[str, float] = {}
+        self._next_prune = 0.0
+        self._task: asyncio.Task | None = None
+
+    def add(self, jti: str, expires_at: float) -> None:
+        self._jtis[jti] = expires_at
+
+        now = time.time()
+        if now >= self._next_prune:
+            self._jtis = {k: v for k, v in self._jtis.items() if v > now}
+            self._next_prune = now + 60
+
+    def __contains__(self, jti: str) -> bool:
+        expires_at = self._jtis.get(jti)
+
+        return expires_at is not None and expires_at > time.time()
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    async def start(self) -> None:
+        if Config.BLOCKLIST_MIRROR and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+        self.warm = False
+
+    async def _bootstrap(self) -> None:
+        now = time.time()
+        await self.redis.zremrangebyscore(BLOCKLIST_KEY, "-inf", now)
+        revoked = await self.redis.zrangebyscore(
+            BLOCKLIST_KEY, now, "+inf", withscores=True
+        )
+
+        for jti, expires_at in revoked:
+            self.add(jti.decode(), expires_at)
+
+    def _apply(self, data: bytes) -> None:
+        try:
+            jti, expires_at = data.decode().rsplit(":", 1)
+            self.add(jti, float(expires_at))
+        except (UnicodeDecodeError, ValueError):
+            logging.warning(f"ignoring malformed blocklist message {data!r}")
+
+    async def _listen(self, pubsub) -> None:
+        last_seen = time.monotonic()
+
+        while True:
+            message = await pubsub.get_message(timeout=MIRROR_PING_INTERVAL)
+
+            if message is not None:
+                last_seen = time.monotonic()
+                if message["type"] == "message":
+                    self._apply(message["data"])
+                continue
+
+            # listen() would block forever on a half-open connection
+            if time.monotonic() - last_seen > 2 * MIRROR_PING_INTERVAL:
+                raise RedisConnectionError("no pong from redis")
+            await pubsub.ping()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                async with self.redis.pubsub() as pubsub:
+                    # subscribe before the bootstrap so no revocation is missed
+                    await pubsub.subscribe(BLOCKLIST_CHANNEL)
+                    await self._bootstrap()
+                    self.warm = True
+                    await self._listen(pubsub)
+
+            except (RedisError, OSError) as e:
+                logging.warning(f"jti blocklist mirror disconnected: {e}")
+            except Exception:
+                logging.exception("jti blocklist mirror failed")
+            finally:
+                # a stale mirror must never answer, fall back to redis
+                self.warm = False
+
+            await asyncio.sleep(MIRROR_RETRY_DELAY)
+
+
+blocklist_mirror = BlocklistMirror(token_block_list)
+
 
 async def add_jti_to_blocklist(jti: str) -> None:
-    await token_block_list.set(name=jti, value="", ex=JWT_EXPIRY)
+    expires_at = time.time() + JWT_EXPIRY
+    blocklist_mirror.add(jti, expires_at)
+
+    with redis_blocklist_add.time():
+        async with token_block_list.pipeline(transaction=True) as pipe:
+            pipe.set(name=jti, value="", ex=JWT_EXPIRY)
+            pipe.zadd(BLOCKLIST_KEY, {jti: expires_at})
+            pipe.publish(BLOCKLIST_CHANNEL, f"{jti}:{expires_at}")
+            await pipe.execute()
+
+
+async def get_token_version(user_uid: str) -> int:
+    with redis_token_version_get.time():
+        version = await token_block_list.get(f"token_version:{user_uid}")
+
+    return int(version) if version is not None else 0
+
+
+async def bump_token_version(user_uid: str) -> None:
+    """Invalidate every access token issued with the current version"""
+
+    with redis_token_version_bump.time():
+        await token_block_list.incr(f"token_version:{user_uid}")
 
 
 async def token_in_blocklist(jti: str) -> bool:
-    jti = await token_block_list.get(jti)
+    if blocklist_mirror.warm or (
+        blocklist_mirror.running and not Config.BLOCKLIST_FALLBACK_TO_REDIS
+    ):
+        return jti in blocklist_mirror
+
+    with redis_blocklist_get.time():
+        jti = await token_block_list.get(jti)
     # 1st method
     """
     return True if jti is not None else False
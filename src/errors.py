@@ -3,6 +3,7 @@ from fastapi.requests import Request
 from fastapi.responses import JSONResponse
 from fastapi import FastAPI, status
 from sqlalchemy.exc import SQLAlchemyError
+import math
 
 
 class BooklyException(Exception):
@@ -77,6 +78,38 @@ class UserNotFound(BooklyException):
     pass
 
 
+class PasswordHasherBusy(BooklyException):
+    """Every password hashing process is busy and the queue is full"""
+
+    pass
+
+
+class InvalidCursor(BooklyException):
+    """User has provided a pagination cursor that cannot be decoded"""
+
+    pass
+
+
+class InvalidImportFile(BooklyException):
+    """User has uploaded an import file that is not valid UTF-8"""
+
+    pass
+
+
+class BookImportFailed(BooklyException):
+    """The database rejected a book import, nothing was imported"""
+
+    pass
+
+
+class RateLimited(BooklyException):
+    """User has sent too many requests to a rate limited route"""
+
+    def __init__(self, retry_after: float) -> None:
+        super().__init__()
+        self.headers = {"Retry-After": str(max(1, math.ceil(retry_after)))}
+
+
 class AccountNotVerified(Exception):
     """Account not yet verified"""
 
@@ -89,7 +122,11 @@ def create_exception_handler(
 
     async def exception_handler(request: Request, exc: BooklyException):
 
-        return JSONResponse(content=initial_detail, status_code=status_code)
+        return JSONResponse(
+            content=initial_detail,
+            status_code=status_code,
+            headers=getattr(exc, "headers", None),
+        )
 
     return exception_handler
 
@@ -220,6 +257,64 @@ def register_all_errors(app: FastAPI):
         ),
     )
 
+    app.add_exception_handler(
+        PasswordHasherBusy,
+        create_exception_handler(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            initial_detail={
+                "message": "Server is busy, please try again shortly",
+                "error_code": "password_hasher_busy",
+            },
+        ),
+    )
+
+    app.add_exception_handler(
+        InvalidCursor,
+        create_exception_handler(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            initial_detail={
+                "message": "Invalid pagination cursor",
+                "resolution": "Use the next_cursor returned by the previous page",
+                "error_code": "invalid_cursor",
+            },
+        ),
+    )
+
+    app.add_exception_handler(
+        InvalidImportFile,
+        create_exception_handler(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            initial_detail={
+                "message": "Import file is not valid UTF-8",
+                "resolution": "Re-encode the file as UTF-8 and upload it again",
+                "error_code": "invalid_import_file",
+            },
+        ),
+    )
+
+    app.add_exception_handler(
+        BookImportFailed,
+        create_exception_handler(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            initial_detail={
+                "message": "Import failed, no books were imported",
+                "error_code": "import_failed",
+            },
+        ),
+    )
+
+    app.add_exception_handler(
+        RateLimited,
+        create_exception_handler(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            initial_detail={
+                "message": "Too many requests",
+                "resolution": "Retry after the number of seconds in Retry-After",
+                "error_code": "rate_limited",
+            },
+        ),
+    )
+
     app.add_exception_handler(
         AccountNotVerified,
         create_exception_handler(
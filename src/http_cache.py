@@ -0,0 +1,61 @@
+from fastapi.requests import Request
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from src.config import Config
+import hashlib
+
+
+def make_etag(*parts) -> str:
+    """Weak validator from whatever identifies the resource version"""
+
+    digest = hashlib.sha1(repr(parts).encode()).hexdigest()[:20]
+
+    return f'W/"{digest}"'
+
+
+def cache_headers(etag: str, last_modified: datetime | None = None) -> dict:
+    """Validators to send with the resource and with its 304s"""
+
+    if Config.HTTP_CACHE_MAX_AGE:
+        cache_control = f"private, max-age={Config.HTTP_CACHE_MAX_AGE}"
+    else:
+        cache_control = "private, no-cache"
+
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+
+    if last_modified is not None:
+        headers["Last-Modified"] = format_datetime(
+            utc(last_modified).replace(microsecond=0), usegmt=True
+        )
+
+    return headers
+
+
+def utc(value: datetime) -> datetime:
+    # timestamps are stored naive
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+def is_not_modified(
+    request: Request, etag: str, last_modified: datetime | None = None
+) -> bool:
+    """Whether the client's copy is current, checked before loading the resource"""
+
+    if_none_match = request.headers.get("if-none-match")
+
+    # If-None-Match wins over If-Modified-Since when both are sent
+    if if_none_match is not None:
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return "*" in tags or etag.removeprefix("W/") in tags
+
+    if_modified_since = request.headers.get("if-modified-since")
+
+    if if_modified_since is None or last_modified is None:
+        return False
+
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+
+    return utc(last_modified).replace(microsecond=0) <= utc(since)
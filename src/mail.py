@@ -1,6 +1,13 @@
 from fastapi_mail import FastMail, ConnectionConfig, MessageSchema, MessageType
 from src.config import Config
 from pathlib import Path
+from typing import Callable
+from email.message import EmailMessage
+from email.utils import formataddr
+import smtplib
+import ssl
+import threading
+import time
 
 BASE_DIR = Path(__file__).resolve().parent
 
@@ -25,3 +32,161 @@ def crate_message(recipients: list[str], subject: str, body: str):
         recipients=recipients, subject=subject, body=body, subtype=MessageType.html
     )
     return message
+
+
+def build_message(recipients: list[str], subject: str, body: str) -> EmailMessage:
+    message = EmailMessage()
+    message["From"] = formataddr((Config.MAIL_FROM_NAME, Config.MAIL_FROM))
+    message["To"] = ", ".join(recipients)
+    message["Subject"] = subject
+    message.set_content(body, subtype="html")
+    return message
+
+
+def is_permanent(exc: smtplib.SMTPException) -> bool:
+    """A 5xx refusal, sending the same message again fails the same way"""
+    if isinstance(exc, smtplib.SMTPRecipientsRefused):
+        return all(code >= 500 for code, _ in exc.recipients.values())
+    return isinstance(exc, smtplib.SMTPResponseException) and exc.smtp_code >= 500
+
+
+class SMTPPool:
+    """SMTP connections kept open across tasks in a Celery worker process
+
+    A connection idle for longer than ``keepalive`` is probed with NOOP before
+    reuse, a dropped one is replaced and the message resent once.
+    """
+
+    def __init__(self, size: int, keepalive: float, timeout: float):
+        self.size = size
+        self.keepalive = keepalive
+        self.timeout = timeout
+        self.idle: list[tuple[smtplib.SMTP, float]] = []
+        self.lock = threading.Lock()
+        self.sent = 0
+        self.seconds = 0.0
+        self.connects = 0
+
+    def _ssl_context(self) -> ssl.SSLContext:
+        context = ssl.create_default_context()
+        if not Config.VALIDATE_CERTS:
+            context.check_hostname = False
+            context.verify_mode = ssl.CERT_NONE
+        return context
+
+    def connect(self) -> smtplib.SMTP:
+        if Config.MAIL_SSL_TLS:
+            smtp = smtplib.SMTP_SSL(
+                Config.MAIL_SERVER,
+                Config.MAIL_PORT,
+                timeout=self.timeout,
+                context=self._ssl_context(),
+            )
+        else:
+            smtp = smtplib.SMTP(
+                Config.MAIL_SERVER, Config.MAIL_PORT, timeout=self.timeout
+            )
+            if Config.MAIL_STARTTLS:
+                smtp.starttls(context=self._ssl_context())
+        if Config.USE_CREDENTIALS:
+            smtp.login(Config.MAIL_USERNAME, Config.MAIL_PASSWORD)
+        self.connects += 1
+        return smtp
+
+    def acquire(self) -> smtplib.SMTP:
+        while True:
+            with self.lock:
+                if not self.idle:
+                    break
+                smtp, last_used = self.idle.pop()
+            if time.monotonic() - last_used < self.keepalive:
+                return smtp
+            try:
+                if smtp.noop()[0] == 250:
+                    return smtp
+            except smtplib.SMTPException:
+                pass
+            self.discard(smtp)
+        return self.connect()
+
+    def release(self, smtp: smtplib.SMTP):
+        with self.lock:
+            if len(self.idle) < self.size:
+                self.idle.append((smtp, time.monotonic()))
+                return
+        self.discard(smtp)
+
+    def discard(self, smtp: smtplib.SMTP):
+        try:
+            smtp.quit()
+        except (smtplib.SMTPException, OSError):
+            smtp.close()
+
+    def send(
+        self,
+        messages: list[EmailMessage],
+        on_sent: Callable[[int], None] | None = None,
+        on_rejected: Callable[[int, smtplib.SMTPException], None] | None = None,
+    ) -> float:
+        """Send messages over one connection, return the batch rate in messages/s
+
+        ``on_sent`` is called with the index of every message the server accepted,
+        so a caller can tell which ones went out before an error. With
+        ``on_rejected`` a message the server permanently refuses is reported
+        there and the rest are still sent, otherwise the refusal is raised.
+        """
+        start = time.perf_counter()
+        smtp = self.acquire()
+        sent = 0
+        try:
+            for i, message in enumerate(messages):
+                try:
+                    try:
+                        smtp.send_message(message)
+                    except smtplib.SMTPServerDisconnected:
+                        self.discard(smtp)
+                        smtp = self.connect()
+                        smtp.send_message(message)
+                except smtplib.SMTPException as exc:
+                    if on_rejected is None or not is_permanent(exc):
+                        raise
+                    on_rejected(i, exc)
+                    continue
+                sent += 1
+                if on_sent is not None:
+                    on_sent(i)
+        # SMTPException is an OSError, the more specific handlers go first
+        except smtplib.SMTPServerDisconnected:
+            smtp.close()
+            raise
+        except smtplib.SMTPException:
+            # a rejected message leaves the connection usable
+            self.release(smtp)
+            raise
+        except OSError:
+            smtp.close()
+            raise
+        self.release(smtp)
+
+        seconds = time.perf_counter() - start
+        self.sent += sent
+        self.seconds += seconds
+        return sent / seconds if seconds else 0.0
+
+    @property
+    def rate(self) -> float:
+        """Messages/s over the lifetime of this worker process"""
+        return self.sent / self.seconds if self.seconds else 0.0
+
+    def close(self):
+        with self.lock:
+            idle, self.idle = self.idle, []
+        for smtp, _ in idle:
+            self.discard(smtp)
+
+
+smtp_pool = SMTPPool(
+    size=Config.SMTP_POOL_SIZE,
+    keepalive=Config.SMTP_KEEPALIVE_SECONDS,
+    timeout=Config.SMTP_TIMEOUT,
+)
@@ -0,0 +1,132 @@
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from prometheus_client.core import GaugeMetricFamily
+from collections import Counter
+from contextvars import ContextVar
+from typing import Callable
+from sqlalchemy import event
+import os
+import time
+
+# per-route, so unmatched paths share one label instead of one per url
+UNMATCHED_ROUTE = "unmatched"
+
+REQUEST_SECONDS = Histogram(
+    "bookly_http_request_duration_seconds",
+    "HTTP request latency by route template",
+    ["method", "route", "status"],
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    "bookly_http_requests_in_flight",
+    "HTTP requests being served",
+    multiprocess_mode="livesum",
+)
+DB_QUERY_SECONDS = Histogram(
+    "bookly_db_query_duration_seconds",
+    "Duration of a single SQL statement",
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1),
+)
+DB_QUERIES_PER_REQUEST = Histogram(
+    "bookly_db_queries_per_request",
+    "SQL statements executed while serving one request",
+    ["route"],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55),
+)
+DB_SECONDS_PER_REQUEST = Histogram(
+    "bookly_db_duration_per_request_seconds",
+    "Time spent in SQL statements while serving one request",
+    ["route"],
+)
+REDIS_SECONDS = Histogram(
+    "bookly_redis_command_duration_seconds",
+    "Redis round trip latency by operation",
+    ["operation"],
+    buckets=(0.0002, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1),
+)
+CELERY_ENQUEUE_SECONDS = Histogram(
+    "bookly_celery_enqueue_duration_seconds",
+    "Time apply_async blocks the caller while publishing a task",
+    ["task"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1),
+)
+
+
+class RequestQueries:
+    """SQL statements seen while serving the current request"""
+
+    __slots__ = ("count", "seconds", "statements")
+
+    def __init__(self, track_statements: bool = False) -> None:
+        self.count = 0
+        self.seconds = 0.0
+        # raw sql -> executions, only kept for the query budget checks
+        self.statements: Counter | None = Counter() if track_statements else None
+
+
+request_queries: ContextVar[RequestQueries | None] = ContextVar(
+    "request_queries", default=None
+)
+
+
+def instrument_engine(engine) -> None:
+    """Time every statement and add it to the current request's counts"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, many):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, many):
+        elapsed = time.perf_counter() - conn.info["query_start"].pop()
+        DB_QUERY_SECONDS.observe(elapsed)
+
+        queries = request_queries.get()
+        if queries is not None:
+            queries.count += 1
+            queries.seconds += elapsed
+
+            if queries.statements is not None:
+                queries.statements[statement] += 1
+
+
+class StatsCollector:
+    """Exposes the numbers in stats() dicts as gauges, read at scrape time"""
+
+    def __init__(self) -> None:
+        self.sources: dict[str, Callable[[], dict]] = {}
+
+    def add(self, prefix: str, stats: Callable[[], dict]) -> None:
+        self.sources[prefix] = stats
+
+    def collect(self):
+        for prefix, stats in self.sources.items():
+            for key, value in stats().items():
+                if isinstance(value, (int, float)):
+                    yield GaugeMetricFamily(
+                        f"bookly_{prefix}_{key}", f"{prefix} {key}", value=value
+                    )
+
+
+stats_collector = StatsCollector()
+REGISTRY.register(stats_collector)
+
+
+def render_metrics() -> tuple[bytes, str]:
+    """Exposition for /metrics, merging every worker when running multiprocess"""
+
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        # stats gauges are per process and only come from the scraped worker
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        registry.register(stats_collector)
+    else:
+        registry = REGISTRY
+
+    return generate_latest(registry), CONTENT_TYPE_LATEST
@@ -4,6 +4,19 @@ from fastapi.requests import Request
 from fastapi.responses import Response, JSONResponse
 import time
 
+from src.access_log import access_log
+from src.config import Config
+from src.db.query_budget import check_request_queries
+from src.metrics import (
+    DB_QUERIES_PER_REQUEST,
+    DB_SECONDS_PER_REQUEST,
+    REQUEST_SECONDS,
+    REQUESTS_IN_FLIGHT,
+    UNMATCHED_ROUTE,
+    RequestQueries,
+    request_queries,
+)
+
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
 
@@ -16,16 +29,44 @@ logger.disabled = True
 def register_middleware(app: FastAPI):
     @app.middleware("http")
     async def custom_logging(request: Request, call_next):
-        start_time = time.time()
+        start = time.perf_counter_ns()
+        status_code = status.HTTP_500_INTERNAL_SERVER_ERROR
+        queries = RequestQueries(track_statements=Config.QUERY_DEBUG)
+        request_queries.set(queries)
+        REQUESTS_IN_FLIGHT.inc()
+
+        try:
+            response: Response = await call_next(request)
+            status_code = response.status_code
+        finally:
+            REQUESTS_IN_FLIGHT.dec()
+            duration_ms = (time.perf_counter_ns() - start) / 1_000_000
+            route = request.scope.get("route")
+            route_path = getattr(route, "path", UNMATCHED_ROUTE)
 
-        response: Response = await call_next(request)
-        end_time = time.time()
+            REQUEST_SECONDS.labels(request.method, route_path, status_code).observe(
+                duration_ms / 1000
+            )
+            DB_QUERIES_PER_REQUEST.labels(route_path).observe(queries.count)
+            DB_SECONDS_PER_REQUEST.labels(route_path).observe(queries.seconds)
 
-        process_time = end_time - start_time
+            if access_log.should_log(status_code, duration_ms):
+                access_log.log(
+                    {
+                        "ts": time.time(),
+                        "client": request.client.host if request.client else None,
+                        "method": request.method,
+                        "path": request.url.path,
+                        "route": getattr(route, "path", None),
+                        "status": status_code,
+                        "duration_ms": round(duration_ms, 3),
+                        "db_queries": queries.count,
+                    }
+                )
 
-        message = f"{request.client.host}:{request.client.port} {request.method} - {request.url.path} -{response.status_code} completed after {process_time}s"
+        if queries.statements is not None:
+            check_request_queries(request, route_path, queries)
 
-        print(message)
         return response
 
     app.add_middleware(
@@ -0,0 +1,139 @@
+from datetime import datetime, timedelta
+from sqlmodel import delete, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from src.celery_tasks import send_emails
+from src.config import Config
+from src.db.main import Session
+from src.db.models import OutboxEmail
+from src.metrics import stats_collector
+import asyncio
+import contextlib
+import logging
+import uuid
+
+
+def add_email(
+    session: AsyncSession, recipients: list[str], subject: str, body: str
+) -> OutboxEmail:
+    """Stage an email on the session, it is only sent if the session commits"""
+    email = OutboxEmail(recipients=recipients, subject=subject, body=body)
+    session.add(email)
+    return email
+
+
+class OutboxDispatcher:
+    """Publishes committed outbox emails to Celery in batches
+
+    Rows are locked with SKIP LOCKED so every API process can run one, and are
+    deleted once published. Each batch is one task, the worker sends it over a
+    single SMTP connection. A batch that fails to publish is retried with
+    exponential backoff. The row uid is the worker's dedup key, a row published
+    twice is only mailed once.
+    """
+
+    def __init__(self, batch_size: int, poll_seconds: float, max_backoff: float):
+        self.batch_size = batch_size
+        self.poll_seconds = poll_seconds
+        self.max_backoff = max_backoff
+        self.published = 0
+        self.failed = 0
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+    def notify(self) -> None:
+        """Dispatch now instead of at the next poll, called after a commit"""
+        self._wakeup.set()
+
+    def publish(self, emails: list[tuple]) -> str | None:
+        # runs in a thread, apply_async blocks on the broker
+        try:
+            send_emails.delay(
+                [
+                    (recipients, subject, body, str(uid))
+                    for uid, recipients, subject, body in emails
+                ]
+            )
+        except Exception as exc:
+            return repr(exc)
+        return None
+
+    async def dispatch(self, session: AsyncSession) -> int:
+        """Publish one batch, return how many emails were handed to Celery"""
+        now = datetime.now()
+        statement = (
+            select(OutboxEmail)
+            .where(OutboxEmail.available_at <= now)
+            .order_by(OutboxEmail.available_at)
+            .limit(self.batch_size)
+            .with_for_update(skip_locked=True)
+        )
+        emails = (await session.exec(statement)).all()
+        if not emails:
+            return 0
+
+        error = await asyncio.to_thread(
+            self.publish,
+            [(e.uid, e.recipients, e.subject, e.body) for e in emails],
+        )
+
+        if error is None:
+            await session.exec(
+                delete(OutboxEmail).where(OutboxEmail.uid.in_([e.uid for e in emails]))
+            )
+        else:
+            # the batch was one task, it backs off and is retried as a whole
+            for email in emails:
+                email.attempts += 1
+                email.last_error = error
+                email.available_at = now + timedelta(
+                    seconds=min(2**email.attempts, self.max_backoff)
+                )
+            self.failed += len(emails)
+            logging.warning("outbox publish failed: %s", error)
+
+        await session.commit()
+
+        if error is not None:
+            return 0
+        self.published += len(emails)
+        return len(emails)
+
+    def stats(self) -> dict:
+        return {"published": self.published, "failed": self.failed}
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            self._wakeup.clear()
+
+            try:
+                async with Session() as session:
+                    published = await self.dispatch(session)
+            except Exception:
+                logging.exception("outbox dispatch failed")
+                published = 0
+
+            # a full batch means there is probably more waiting
+            if published == self.batch_size:
+                continue
+
+            with contextlib.suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_seconds)
+
+
+outbox_dispatcher = OutboxDispatcher(
+    batch_size=Config.OUTBOX_BATCH_SIZE,
+    poll_seconds=Config.OUTBOX_POLL_SECONDS,
+    max_backoff=Config.OUTBOX_MAX_BACKOFF_SECONDS,
+)
+stats_collector.add("outbox", outbox_dispatcher.stats)
@@ -0,0 +1,158 @@
+from collections import OrderedDict
+from fastapi.requests import Request
+from redis.exceptions import RedisError
+from src.auth.utils import decode_token
+from src.config import Config
+from src.db.redis import token_block_list
+from src.errors import RateLimited
+from src.metrics import REDIS_SECONDS
+import logging
+import math
+import time
+
+# KEYS[1] bucket; ARGV rate (tokens/s), capacity, tokens wanted (the lease).
+# Grants between 1 and the lease, or 0 and the seconds until one token is back.
+TOKEN_BUCKET_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local lease = tonumber(ARGV[3])
+local clock = redis.call("TIME")
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+
+local bucket = redis.call("HMGET", KEYS[1], "tokens", "ts")
+local tokens = tonumber(bucket[1]) or capacity
+local ts = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+
+local granted = math.min(lease, math.floor(tokens))
+local retry_after = 0
+if granted < 1 then
+    granted = 0
+    retry_after = (1 - tokens) / rate
+end
+
+redis.call("HSET", KEYS[1], "tokens", tokens - granted, "ts", now)
+redis.call("EXPIRE", KEYS[1], math.ceil(capacity / rate) + 1)
+
+return {granted, tostring(retry_after)}
+"""
+
+token_bucket = token_block_list.register_script(TOKEN_BUCKET_SCRIPT)
+redis_rate_limit = REDIS_SECONDS.labels("rate_limit")
+
+# buckets with local state per worker, least recently used dropped first
+LOCAL_BUCKETS = 10000
+
+
+class RateLimiter:
+    """Token bucket per route and client, kept in Redis by a Lua script
+
+    The client is the user of a valid bearer token, otherwise the IP. Each
+    Redis call may lease several tokens that this worker then spends for up
+    to `local_window` seconds without a round trip, and a denial is cached
+    until the bucket refills, so only a share of requests reach Redis.
+    Add it to a route's or router's `dependencies`; `methods` limits which
+    requests it counts.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        per_minute: int,
+        burst: int,
+        lease: int = 1,
+        local_window: float = 1.0,
+        methods: set[str] | None = None,
+    ) -> None:
+        self.name = name
+        self.rate = per_minute / 60
+        self.burst = burst
+        self.lease = max(1, min(lease, burst))
+        self.local_window = local_window
+        self.methods = methods
+        # key -> (leased tokens left, until), or (0, until) while denied
+        self._local: OrderedDict[str, tuple[int, float]] = OrderedDict()
+
+    def client_key(self, request: Request) -> str:
+        authorization = request.headers.get("authorization", "")
+        scheme, _, token = authorization.partition(" ")
+
+        if scheme.lower() == "bearer" and token:
+            token_data = decode_token(token)
+            if token_data is not None:
+                return f"user:{token_data['user']['user_uid']}"
+
+        return f"ip:{request.client.host if request.client else 'unknown'}"
+
+    def bucket_key(self, request: Request) -> str:
+        route = request.scope.get("route")
+        route_path = getattr(route, "path", request.url.path)
+
+        return (
+            f"rate_limit:{self.name}:{request.method} {route_path}:"
+            f"{self.client_key(request)}"
+        )
+
+    async def __call__(self, request: Request) -> None:
+        if not Config.RATE_LIMIT_ENABLED:
+            return
+
+        if self.methods is not None and request.method not in self.methods:
+            return
+
+        key = self.bucket_key(request)
+        now = time.monotonic()
+        tokens, until = self._local.get(key, (0, 0.0))
+
+        if now < until:
+            if tokens == 0:
+                raise RateLimited(until - now)
+
+            if tokens == 1:
+                # lease spent, the next request asks Redis again
+                del self._local[key]
+            else:
+                self._remember(key, tokens - 1, until)
+            return
+
+        try:
+            with redis_rate_limit.time():
+                granted, retry_after = await token_bucket(
+                    keys=[key], args=[self.rate, self.burst, self.lease]
+                )
+        except RedisError as e:
+            # fail open, an unreachable Redis must not take the API down
+            logging.warning(f"rate limiter unavailable: {e}")
+            return
+
+        if granted == 0:
+            retry_after = float(retry_after)
+            self._remember(key, 0, now + retry_after)
+            raise RateLimited(retry_after)
+
+        if granted > 1:
+            self._remember(key, granted - 1, now + self.local_window)
+
+    def _remember(self, key: str, tokens: int, until: float) -> None:
+        self._local[key] = (tokens, until)
+        self._local.move_to_end(key)
+
+        while len(self._local) > LOCAL_BUCKETS:
+            self._local.popitem(last=False)
+
+
+# bcrypt and outgoing mail, counted per client and route
+auth_rate_limit = RateLimiter(
+    "auth",
+    per_minute=Config.AUTH_RATE_LIMIT_PER_MINUTE,
+    burst=Config.AUTH_RATE_LIMIT_BURST,
+)
+
+# added to the books, reviews and tags routers, reads are not counted
+write_rate_limit = RateLimiter(
+    "write",
+    per_minute=Config.WRITE_RATE_LIMIT_PER_MINUTE,
+    burst=Config.WRITE_RATE_LIMIT_BURST,
+    lease=Config.WRITE_RATE_LIMIT_LEASE,
+    methods={"POST", "PUT", "PATCH", "DELETE"},
+)
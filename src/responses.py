@@ -0,0 +1,22 @@
+from fastapi import status
+from fastapi.responses import Response
+from pydantic import TypeAdapter
+
+
+def model_response(
+    adapter: TypeAdapter,
+    content,
+    status_code: int = status.HTTP_200_OK,
+    headers: dict | None = None,
+) -> Response:
+    """Validate ORM objects by attribute and dump them to JSON in pydantic-core
+
+    Skips FastAPI's response_model round trip (validate, dump to a dict,
+    encode the dict), keep response_model on the route for the OpenAPI schema.
+    """
+
+    body = adapter.dump_json(adapter.validate_python(content, from_attributes=True))
+
+    return Response(
+        body, status_code=status_code, headers=headers, media_type="application/json"
+    )
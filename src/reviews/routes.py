@@ -1,23 +1,50 @@
-from fastapi import APIRouter, Depends, status
+from fastapi import APIRouter, Depends, Request, status
+from fastapi.responses import Response, StreamingResponse
+from datetime import datetime
+from typing import List, Optional
 from sqlmodel.ext.asyncio.session import AsyncSession
 from src.db.models import User
-from .schema import ReviewCreateModal
+from .schema import ReviewCreateModal, ReviewModal, review_adapter, review_list_adapter
 from src.db.main import get_session
+from src.db.query_budget import QueryBudget
+from src.rate_limit import write_rate_limit
 from .service import ReviewService
 from src.errors import BookNotFound
+from src.http_cache import make_etag, cache_headers, is_not_modified
+from src.responses import model_response
 from src.auth.dependencies import get_current_user, RoleChecker
 
 
-review_router = APIRouter()
+review_router = APIRouter(dependencies=[Depends(write_rate_limit)])
 review_service = ReviewService()
 admin_role_checker = Depends(RoleChecker(["admin"]))
 user_role_checker = Depends(RoleChecker(["admin", "user"]))
 
 
-@review_router.get("/")
-async def get_all_reviews(session: AsyncSession = Depends(get_session)):
+@review_router.get(
+    "/", response_model=List[ReviewModal], dependencies=[Depends(QueryBudget(2))]
+)
+async def get_all_reviews(
+    request: Request, session: AsyncSession = Depends(get_session)
+):
+    count, updated_at = await review_service.get_reviews_version(session)
+    etag = make_etag("reviews", count, updated_at)
+    headers = cache_headers(etag, updated_at)
+
+    if is_not_modified(request, etag, updated_at):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
     books = await review_service.get_all_reviews(session)
-    return books
+
+    return model_response(review_list_adapter, books, headers=headers)
+
+
+@review_router.get("/export", dependencies=[user_role_checker])
+async def export_reviews(updated_since: Optional[datetime] = None):
+    return StreamingResponse(
+        await review_service.export_reviews(updated_since),
+        media_type="application/x-ndjson",
+    )
 
 
 @review_router.get("/{review_uid}", dependencies=[user_role_checker])
@@ -28,7 +55,7 @@ async def get_review(review_uid: str, session: AsyncSession = Depends(get_sessio
         raise BookNotFound()
 
 
-@review_router.post("/book/{book_uid}")
+@review_router.post("/book/{book_uid}", response_model=ReviewModal)
 async def add_review_to_book(
     book_uid: str,
     review_data: ReviewCreateModal,
@@ -42,7 +69,7 @@ async def add_review_to_book(
         session=session,
     )
 
-    return new_review
+    return model_response(review_adapter, new_review)
 
 
 @review_router.delete(
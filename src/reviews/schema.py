@@ -1,6 +1,6 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, TypeAdapter
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 import uuid
 
 
@@ -17,3 +17,8 @@ class ReviewModal(BaseModel):
 class ReviewCreateModal(BaseModel):
     rating: int = Field(lt=5)
     review_text: str
+
+
+# built once per process, see src/responses.py
+review_adapter = TypeAdapter(ReviewModal)
+review_list_adapter = TypeAdapter(List[ReviewModal])
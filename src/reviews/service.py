@@ -1,12 +1,17 @@
 from fastapi.exceptions import HTTPException
 from fastapi import status
-from src.db.models import Review
+from src.db.models import Review, Book
 from src.auth.service import UserService
 from src.books.service import BookService
 from sqlmodel.ext.asyncio.session import AsyncSession
 from .schema import ReviewCreateModal
-from sqlmodel import select, desc
+from sqlmodel import select, desc, update
+from sqlalchemy import Float, Integer, Text, case, cast, func
+from sqlalchemy.dialects.postgresql import ARRAY, array
+from src.db.export import naive_utc, stream_ndjson
 from src.errors import BookNotFound, UserNotFound
+from datetime import datetime
+from typing import Optional
 import logging
 
 book_service = BookService()
@@ -37,6 +42,7 @@ class ReviewService:
             new_review.book = book
 
             session.add(new_review)
+            await self.update_book_rating(book.uid, new_review.rating, 1, session)
             await session.commit()
 
             return new_review
@@ -55,6 +61,15 @@ class ReviewService:
 
         return result.first()
 
+    async def get_reviews_version(self, session: AsyncSession):
+        """(count, last change) of the reviews table"""
+
+        statement = select(func.count(), func.max(Review.updated_at))
+
+        result = await session.exec(statement)
+
+        return result.one()
+
     async def get_all_reviews(self, session: AsyncSession):
         statement = select(Review).order_by(desc(Review.created_at))
 
@@ -62,6 +77,16 @@ class ReviewService:
 
         return result.all()
 
+    async def export_reviews(self, updated_since: Optional[datetime] = None):
+        """Stream every review as NDJSON"""
+
+        statement = select(Review.__table__)
+
+        if updated_since is not None:
+            statement = statement.where(Review.updated_at >= naive_utc(updated_since))
+
+        return await stream_ndjson(statement)
+
     async def delete_review_to_from_book(
         self, review_uid: str, user_email: str, session: AsyncSession
     ):
@@ -75,6 +100,40 @@ class ReviewService:
                 status_code=status.HTTP_403_FORBIDDEN,
             )
 
-        session.delete(review)
+        await session.delete(review)
+        await self.update_book_rating(review.book_uid, review.rating, -1, session)
 
         await session.commit()
+
+    async def update_book_rating(
+        self, book_uid, rating: int, delta: int, session: AsyncSession
+    ):
+        """Apply one review being added (delta=1) or removed (delta=-1) to the
+        book's aggregates, in the caller's transaction"""
+
+        review_count = Book.review_count + delta
+        rating_sum = Book.rating_sum + delta * rating
+        bucket = str(rating)
+
+        await session.exec(
+            update(Book)
+            .where(Book.uid == book_uid)
+            .values(
+                review_count=review_count,
+                rating_sum=rating_sum,
+                rating_avg=case(
+                    (review_count > 0, cast(rating_sum, Float) / review_count),
+                    else_=0,
+                ),
+                rating_histogram=func.jsonb_set(
+                    Book.rating_histogram,
+                    cast(array([bucket]), ARRAY(Text)),
+                    func.to_jsonb(
+                        func.coalesce(
+                            Book.rating_histogram[bucket].astext.cast(Integer), 0
+                        )
+                        + delta
+                    ),
+                ),
+            )
+        )
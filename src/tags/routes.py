@@ -1,26 +1,56 @@
-from typing import List
+from datetime import datetime
+from typing import List, Optional
 
-from fastapi import APIRouter, Depends, status
+from fastapi import APIRouter, Depends, Request, status
+from fastapi.responses import Response, StreamingResponse
 from sqlmodel.ext.asyncio.session import AsyncSession
 
 
 from src.auth.dependencies import RoleChecker
-from src.books.schema import Book
+from src.books.schema import Book, book_adapter
 from src.db.main import get_session
-
-from .schemas import TagAddModel, TagCreateModel, TagModel
+from src.db.query_budget import QueryBudget
+from src.rate_limit import write_rate_limit
+from src.http_cache import make_etag, cache_headers, is_not_modified
+from src.responses import model_response
+
+from .schemas import (
+    TagAddModel,
+    TagCreateModel,
+    TagModel,
+    tag_adapter,
+    tag_list_adapter,
+)
 from .service import TagService
 
-tags_router = APIRouter()
+tags_router = APIRouter(dependencies=[Depends(write_rate_limit)])
 tag_service = TagService()
 user_role_checker = Depends(RoleChecker(["user", "admin"]))
 
 
-@tags_router.get("/", response_model=List[TagModel], dependencies=[user_role_checker])
-async def get_all_tags(session: AsyncSession = Depends(get_session)):
+@tags_router.get(
+    "/",
+    response_model=List[TagModel],
+    dependencies=[user_role_checker, Depends(QueryBudget(3))],
+)
+async def get_all_tags(request: Request, session: AsyncSession = Depends(get_session)):
+    count, updated_at = await tag_service.get_tags_version(session)
+    etag = make_etag("tags", count, updated_at)
+    headers = cache_headers(etag, updated_at)
+
+    if is_not_modified(request, etag, updated_at):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
     tags = await tag_service.get_tags(session)
 
-    return tags
+    return model_response(tag_list_adapter, tags, headers=headers)
+
+
+@tags_router.get("/export", dependencies=[user_role_checker])
+async def export_tags(updated_since: Optional[datetime] = None):
+    return StreamingResponse(
+        await tag_service.export_tags(updated_since), media_type="application/x-ndjson"
+    )
 
 
 @tags_router.post(
@@ -35,11 +65,13 @@ async def add_tag(
 
     tag_added = await tag_service.add_tag(tag_data=tag_data, session=session)
 
-    return tag_added
+    return model_response(tag_adapter, tag_added, status_code=status.HTTP_201_CREATED)
 
 
 @tags_router.post(
-    "/book/{book_uid}/tags", response_model=Book, dependencies=[user_role_checker]
+    "/book/{book_uid}/tags",
+    response_model=Book,
+    dependencies=[user_role_checker, Depends(QueryBudget(7))],
 )
 async def add_tags_to_book(
     book_uid: str, tag_data: TagAddModel, session: AsyncSession = Depends(get_session)
@@ -49,7 +81,7 @@ async def add_tags_to_book(
         book_uid=book_uid, tag_data=tag_data, session=session
     )
 
-    return book_with_tag
+    return model_response(book_adapter, book_with_tag)
 
 
 @tags_router.put(
@@ -62,7 +94,7 @@ async def update_tag(
 ) -> TagModel:
     updated_tag = await tag_service.update_tag(tag_uid, tag_update_data, session)
 
-    return updated_tag
+    return model_response(tag_adapter, updated_tag)
 
 
 @tags_router.delete(
@@ -2,7 +2,7 @@ import uuid
 from datetime import datetime
 from typing import List
 
-from pydantic import BaseModel
+from pydantic import BaseModel, TypeAdapter
 
 
 class TagModel(BaseModel):
@@ -17,3 +17,8 @@ class TagCreateModel(BaseModel):
 
 class TagAddModel(BaseModel):
     tags: List[TagCreateModel]
+
+
+# built once per process, see src/responses.py
+tag_adapter = TypeAdapter(TagModel)
+tag_list_adapter = TypeAdapter(List[TagModel])
@@ -4,7 +4,16 @@ from sqlmodel import desc, select
 from sqlmodel.ext.asyncio.session import AsyncSession
 
 from src.books.service import BookService
-from src.db.models import Tag
+from src.db.models import Tag, BookTag
+from src.db.loaders import BOOK_OPTIONS, TAG_DELETE_OPTIONS
+from src.db.export import naive_utc, stream_ndjson
+from src.autocomplete.service import autocomplete
+from sqlalchemy import any_, func
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import IntegrityError
+from datetime import datetime
+from typing import Optional
+import uuid
 
 from .schemas import TagAddModel, TagCreateModel
 
@@ -29,6 +38,25 @@ class TagService:
 
         return result.all()
 
+    async def get_tags_version(self, session: AsyncSession):
+        """(count, last change) of the tags table, changes with every tag write"""
+
+        statement = select(func.count(), func.max(Tag.updated_at))
+
+        result = await session.exec(statement)
+
+        return result.one()
+
+    async def export_tags(self, updated_since: Optional[datetime] = None):
+        """Stream every tag as NDJSON"""
+
+        statement = select(Tag.__table__)
+
+        if updated_since is not None:
+            statement = statement.where(Tag.updated_at >= naive_utc(updated_since))
+
+        return await stream_ndjson(statement)
+
     async def add_tags_to_book(
         self, book_uid: str, tag_data: TagAddModel, session: AsyncSession
     ):
@@ -39,28 +67,91 @@ class TagService:
         if not book:
             raise BookNotFound()
 
-        for tag_item in tag_data.tags:
-            result = await session.exec(select(Tag).where(Tag.name == tag_item.name))
+        names = list(dict.fromkeys(tag_item.name for tag_item in tag_data.tags))
 
-            tag = result.one_or_none()
-            if not tag:
-                tag = Tag(name=tag_item.name)
+        if names:
+            tag_uids, created = await self.get_or_create_tag_uids(names, session)
 
-            book.tags.append(tag)
-        session.add(book)
-        await session.commit()
-        await session.refresh(book)
-        return book
+            await session.exec(
+                insert(BookTag)
+                .values([{"book_id": book.uid, "tag_id": uid} for uid in tag_uids])
+                .on_conflict_do_nothing()
+            )
+            await session.commit()
 
-    async def get_tag_by_uid(self, tag_uid: str, session: AsyncSession):
+            for name, uid in created:
+                autocomplete.add("tag", name, uid)
+
+        return await book_service.get_book(
+            book_uid=book_uid, session=session, options=BOOK_OPTIONS
+        )
+
+    async def get_or_create_tag_uids(self, names: list[str], session: AsyncSession):
+        """Resolve tag names to uids, creating the missing tags in one statement
+
+        Returns the uids and the (name, uid) of the tags that were created.
+        """
+
+        result = await session.exec(
+            select(Tag.name, Tag.uid).where(Tag.name == any_(names))
+        )
+        tag_uids = dict(result.all())
+
+        missing = [name for name in names if name not in tag_uids]
+        created = []
+
+        if missing:
+            now = datetime.now()
+            result = await session.exec(
+                insert(Tag)
+                .values(
+                    [
+                        {
+                            "uid": uuid.uuid4(),
+                            "name": name,
+                            "created_at": now,
+                            "updated_at": now,
+                        }
+                        for name in missing
+                    ]
+                )
+                .on_conflict_do_nothing(index_elements=["name"])
+                .returning(Tag.name, Tag.uid)
+            )
+            created = result.all()
+            tag_uids.update(created)
+
+        if len(tag_uids) < len(names):
+            # created by a concurrent request between the select and the insert
+            result = await session.exec(
+                select(Tag.name, Tag.uid).where(
+                    Tag.name == any_([name for name in names if name not in tag_uids])
+                )
+            )
+            tag_uids.update(result.all())
+
+        return list(tag_uids.values()), created
+
+    async def get_tag_by_uid(self, tag_uid: str, session: AsyncSession, options=()):
         """Get tag by uid"""
 
-        statement = select(Tag).where(Tag.uid == tag_uid)
+        statement = select(Tag).where(Tag.uid == tag_uid).options(*options)
 
         result = await session.exec(statement)
 
         return result.first()
 
+    async def commit_tag(self, session: AsyncSession) -> None:
+        """Commit a tag write, a name taken by a concurrent request is reported
+        like one found by the check before the write"""
+
+        try:
+            await session.commit()
+        except IntegrityError:
+            # ix_tags_name
+            await session.rollback()
+            raise TagAlreadyExists()
+
     async def add_tag(self, tag_data: TagCreateModel, session: AsyncSession):
         """Create a tag"""
 
@@ -76,7 +167,9 @@ class TagService:
 
         session.add(new_tag)
 
-        await session.commit()
+        await self.commit_tag(session)
+
+        autocomplete.add("tag", new_tag.name, new_tag.uid)
 
         return new_tag
 
@@ -91,20 +184,31 @@ class TagService:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
 
         update_data_dict = tag_update_data.model_dump()
+        name = tag.name
+
+        if update_data_dict["name"] != name:
+            statement = select(Tag.uid).where(
+                Tag.name == update_data_dict["name"], Tag.uid != tag.uid
+            )
+            if (await session.exec(statement)).first():
+                raise TagAlreadyExists()
 
         for k, v in update_data_dict.items():
             setattr(tag, k, v)
 
-            await session.commit()
+        await self.commit_tag(session)
 
-            await session.refresh(tag)
+        await session.refresh(tag)
+
+        autocomplete.remove("tag", name, tag.uid)
+        autocomplete.add("tag", tag.name, tag.uid)
 
         return tag
 
     async def delete_tag(self, tag_uid: str, session: AsyncSession):
         """Delete a tag"""
 
-        tag = self.get_tag_by_uid(tag_uid, session)
+        tag = await self.get_tag_by_uid(tag_uid, session, options=TAG_DELETE_OPTIONS)
 
         if not tag:
             raise TagNotFound()
@@ -112,3 +216,5 @@ class TagService:
         await session.delete(tag)
 
         await session.commit()
+
+        autocomplete.remove("tag", tag.name, tag.uid)
@@ -0,0 +1,23 @@
+from src.access_log import AccessLog, JsonFormatter
+import json
+
+
+def test_errors_and_slow_requests_skip_sampling():
+    access_log = AccessLog(queue_size=10, sample_rate=0, slow_ms=500)
+
+    assert not access_log.should_log(200, 10)
+    assert access_log.should_log(404, 10)
+    assert access_log.should_log(500, 10)
+    assert access_log.should_log(200, 500)
+
+
+def test_full_queue_drops_instead_of_blocking():
+    access_log = AccessLog(queue_size=1, sample_rate=1, slow_ms=500)
+
+    access_log.log({"status": 200})
+    access_log.log({"status": 201})
+
+    assert access_log.handler.dropped == 1
+
+    record = access_log.queue.get_nowait()
+    assert json.loads(JsonFormatter().format(record)) == {"status": 200}
@@ -1,4 +1,16 @@
 from src.auth.schema import UserCreateModel
+from src.auth import dependencies, utils
+from src.auth.utils import (
+    PasswordHasher,
+    TokenCache,
+    create_access_token,
+    decode_token,
+)
+from src.errors import InvalidToken, PasswordHasherBusy
+import asyncio
+import pytest
+import time
+import uuid
 
 auth_prefix = f"/api/v1/auth"
 
@@ -25,3 +37,97 @@ def test_user_creation(fake_session, fake_user_service, test_client):
     )
     assert fake_user_service.create_user_called_once()
     assert fake_user_service.create_user_called_once_with(user_data, fake_session)
+
+
+def token_details(token_version: int) -> dict:
+    return {
+        "user": {
+            "email": "rohitvanzara@gmail.com",
+            "user_uid": str(uuid.uuid4()),
+            "role": "user",
+            "is_verified": True,
+            "token_version": token_version,
+        }
+    }
+
+
+def test_token_user_from_claims(monkeypatch):
+    async def current_version(user_uid):
+        return 1
+
+    monkeypatch.setattr(dependencies, "get_token_version", current_version)
+
+    user = asyncio.run(dependencies.get_token_user(token_details(1), session=None))
+
+    assert user.role == "user"
+    assert user.is_verified
+
+
+def test_token_user_rejects_stale_version(monkeypatch):
+    async def current_version(user_uid):
+        return 2
+
+    monkeypatch.setattr(dependencies, "get_token_version", current_version)
+
+    with pytest.raises(InvalidToken):
+        asyncio.run(dependencies.get_token_user(token_details(1), session=None))
+
+
+def test_decode_token_verifies_signature_once(monkeypatch):
+    token = create_access_token(user_data={"email": "rohitvanzara@gmail.com"})
+    token_data = decode_token(token)
+
+    def fail_decode(*args, **kwargs):
+        raise AssertionError("token should come from the cache")
+
+    monkeypatch.setattr(utils.jwt, "decode", fail_decode)
+
+    assert decode_token(token) is token_data
+
+
+def test_token_cache_drops_expired_and_oldest_tokens():
+    cache = TokenCache(maxsize=2)
+    cache.set("expired", {"exp": time.time() - 1})
+    cache.set("first", {"exp": time.time() + 60})
+    cache.set("second", {"exp": time.time() + 60})
+
+    assert cache.get("expired") is None
+    assert cache.get("first") is not None
+
+    cache.set("third", {"exp": time.time() + 60})
+
+    assert cache.get("second") is None
+    assert cache.get("third") is not None
+
+
+def test_password_hasher_round_trip():
+    hasher = PasswordHasher(workers=1, queue_limit=1)
+
+    async def hash_and_verify():
+        password_hash = await hasher.hash("yogesh@4801")
+        return await hasher.verify("yogesh@4801", password_hash)
+
+    try:
+        assert asyncio.run(hash_and_verify())
+        assert hasher.stats()["completed"] == 2
+    finally:
+        hasher.shutdown()
+
+
+def test_password_hasher_rejects_when_saturated():
+    hasher = PasswordHasher(workers=1, queue_limit=0)
+
+    async def burst():
+        return await asyncio.gather(
+            hasher.hash("yogesh@4801"),
+            hasher.hash("yogesh@4801"),
+            return_exceptions=True,
+        )
+
+    try:
+        first, second = asyncio.run(burst())
+        assert isinstance(first, str)
+        assert isinstance(second, PasswordHasherBusy)
+        assert hasher.stats()["rejected"] == 1
+    finally:
+        hasher.shutdown()
@@ -0,0 +1,84 @@
+from src.autocomplete.index import PrefixIndex
+from src.autocomplete.service import Autocomplete
+import asyncio
+import uuid
+
+
+def test_prefix_index_matches_any_word_start():
+    index = PrefixIndex({"Harry Potter": 2, "The Hobbit": 1})
+
+    assert [value for _, value in index.search("harry", 10)] == ["Harry Potter"]
+    assert [value for _, value in index.search("POT", 10)] == ["Harry Potter"]
+    assert [value for _, value in index.search("h", 10)] == [
+        "Harry Potter",
+        "The Hobbit",
+    ]
+    assert index.search("x", 10) == []
+
+
+def test_prefix_index_keeps_shared_values_until_last_remove():
+    index = PrefixIndex()
+    index.add("Dune")
+    index.add("Dune")
+
+    index.remove("Dune")
+    assert index.search("du", 10) == [("dune", "Dune")]
+
+    index.remove("Dune")
+    assert index.search("du", 10) == []
+    assert index.keys == []
+
+
+def test_autocomplete_merges_kinds_in_key_order():
+    autocomplete = Autocomplete()
+    autocomplete.add("title", "Fantastic Beasts", uuid.uuid4())
+    autocomplete.add("tag", "fantasy", uuid.uuid4())
+    autocomplete.add("author", "Frank Herbert", uuid.uuid4())
+
+    suggestions = autocomplete.search("fan", ["title", "author", "tag"], 10)
+
+    assert suggestions == [
+        {"kind": "title", "value": "Fantastic Beasts", "fuzzy": False},
+        {"kind": "tag", "value": "fantasy", "fuzzy": False},
+    ]
+    assert autocomplete.search("fan", ["tag"], 10)[0]["value"] == "fantasy"
+
+
+class FakeResult:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def all(self):
+        return self.rows
+
+
+class SnapshotSession:
+    """Dune is committed before the snapshot but only added to the index after
+    it was read, Emma is committed and added after the snapshot"""
+
+    def __init__(self, autocomplete):
+        self.autocomplete = autocomplete
+        self.dune, self.emma = uuid.uuid4(), uuid.uuid4()
+        self.results = [
+            [("title", "Dune", 1), ("author", "Frank Herbert", 1)],
+            [(self.dune, "Dune")],
+        ]
+
+    async def connection(self, execution_options):
+        assert execution_options == {"isolation_level": "REPEATABLE READ"}
+
+    async def execute(self, statement):
+        rows = self.results.pop(0)
+        if not self.results:
+            return FakeResult(rows)
+        self.autocomplete.add("title", "Dune", self.dune)
+        self.autocomplete.add("title", "Emma", self.emma)
+        return FakeResult(rows)
+
+
+def test_rebuild_counts_rows_written_while_loading_once():
+    autocomplete = Autocomplete()
+
+    asyncio.run(autocomplete.rebuild(SnapshotSession(autocomplete)))
+
+    assert autocomplete.indexes["title"].counts == {"Dune": 1, "Emma": 1}
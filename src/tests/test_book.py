@@ -1,3 +1,25 @@
+from datetime import datetime, timedelta, timezone
+from src.db import export
+from src.db.export import naive_utc
+from pydantic import ValidationError
+from src.books import utils
+from src.books.schema import BookImportRow
+from src.books.utils import (
+    aiter_import_rows,
+    encode_cursor,
+    decode_cursor,
+    iter_import_rows,
+    search_configs,
+)
+from sqlalchemy.dialects import postgresql
+from src.books.service import BookService
+from src.errors import InvalidCursor, InvalidImportFile
+from unittest.mock import AsyncMock, Mock
+import asyncio
+import io
+import pytest
+import uuid
+
 book_prefix = f"/api/v1/books"
 
 
@@ -6,3 +28,134 @@ def test_get_all_books(test_client, fake_book_service, fake_session):
 
     assert fake_book_service.get_all_books_called_once()
     assert fake_book_service.get_all_books_called_once_with(fake_session)
+
+
+def test_cursor_round_trip():
+    created_at = datetime(2025, 4, 18, 14, 42, 26, 243027)
+    uid = uuid.uuid4()
+
+    cursor = encode_cursor("created_at", created_at, uid)
+
+    assert decode_cursor(cursor, "created_at") == (created_at, uid)
+    assert decode_cursor(encode_cursor("rating", 3.5, uid), "rating") == (3.5, uid)
+
+
+def test_invalid_cursor_is_rejected():
+    with pytest.raises(InvalidCursor):
+        decode_cursor("not-a-cursor", "created_at")
+
+    with pytest.raises(InvalidCursor):
+        decode_cursor(encode_cursor("rating", 3.5, uuid.uuid4()), "created_at")
+
+
+def test_iter_import_rows_reads_csv_and_ndjson():
+    csv_file = io.BytesIO(b"title,author\nBookly,Yogesh\n")
+    ndjson_file = io.BytesIO(b'{"title": "Bookly"}\n\nnot json\n')
+
+    assert list(iter_import_rows(csv_file, "csv")) == [
+        (2, {"title": "Bookly", "author": "Yogesh"})
+    ]
+    assert list(iter_import_rows(ndjson_file, "ndjson")) == [
+        (1, {"title": "Bookly"}),
+        (3, None),
+    ]
+    assert not csv_file.closed
+
+
+def test_iter_import_rows_rejects_non_utf8_files():
+    upload = io.BytesIO(b'{"title": "Bookly"}\n\xff\xfe\n')
+
+    with pytest.raises(InvalidImportFile):
+        list(iter_import_rows(upload, "ndjson"))
+    assert not upload.closed
+
+
+def test_aiter_import_rows_reads_in_chunks(monkeypatch):
+    monkeypatch.setattr(utils, "IMPORT_CHUNK_SIZE", 2)
+    upload = io.BytesIO(b"".join(b'{"n": %d}\n' % n for n in range(5)))
+
+    async def collect():
+        return [row async for row in aiter_import_rows(upload, "ndjson")]
+
+    assert asyncio.run(collect()) == [(n + 1, {"n": n}) for n in range(5)]
+
+
+def test_import_rows_are_checked_against_postgres_limits():
+    row = {
+        "title": "Bookly",
+        "author": "Yogesh",
+        "publisher": "Bookly",
+        "page_count": 300,
+        "language": "en",
+        "published_date": "2024-01-01",
+    }
+    BookImportRow.model_validate(row)
+
+    with pytest.raises(ValidationError) as overflow:
+        BookImportRow.model_validate({**row, "page_count": 2**31})
+    with pytest.raises(ValidationError) as nul:
+        BookImportRow.model_validate({**row, "title": "Book\x00ly"})
+
+    assert overflow.value.errors()[0]["loc"] == ("page_count",)
+    assert nul.value.errors()[0]["loc"] == ("title",)
+
+
+def test_search_configs_follow_book_language():
+    assert search_configs("en") == ["english"]
+    assert search_configs("French") == ["french"]
+    assert search_configs("klingon") == ["simple"]
+    assert "simple" in search_configs()
+
+
+def test_build_facets_splits_grouping_sets():
+    rows = [
+        (0b011, "scifi", 2),
+        (0b011, "classic", 3),
+        (0b011, None, 1),
+        (0b101, "en", 4),
+        (0b110, "Penguin", 4),
+    ]
+
+    facets = BookService().build_facets(rows)
+
+    assert facets["tags"] == [
+        {"value": "classic", "count": 3},
+        {"value": "scifi", "count": 2},
+    ]
+    assert facets["language"] == [{"value": "en", "count": 4}]
+    assert facets["publisher"] == [{"value": "Penguin", "count": 4}]
+
+
+def test_export_timestamps_compare_as_naive_utc():
+    aware = datetime(2024, 1, 1, 5, 30, tzinfo=timezone(timedelta(hours=5)))
+
+    assert naive_utc(aware) == datetime(2024, 1, 1, 0, 30)
+    assert naive_utc(datetime(2024, 1, 1)) == datetime(2024, 1, 1)
+    assert naive_utc(None) is None
+
+
+def test_export_errors_raise_before_streaming(monkeypatch):
+    session = AsyncMock()
+    session.stream.side_effect = ConnectionRefusedError()
+    monkeypatch.setattr(export, "Session", lambda: session)
+
+    with pytest.raises(ConnectionRefusedError):
+        asyncio.run(export.stream_ndjson(Mock()))
+    session.close.assert_awaited_once()
+
+
+def test_book_version_reads_only_the_books_own_tags():
+    session = AsyncMock()
+    session.exec.return_value = Mock()
+    book_uid = str(uuid.uuid4())
+
+    asyncio.run(BookService().get_book_version(book_uid, session))
+
+    sql = str(
+        session.exec.call_args.args[0].compile(
+            dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}
+        )
+    )
+    # tagging another book must not change this book's ETag
+    assert sql.count("FROM books") == 1
+    assert sql.count(f"WHERE booktag.book_id = '{book_uid}'") == 2
@@ -0,0 +1,37 @@
+from datetime import datetime
+from fastapi.requests import Request
+from src.http_cache import cache_headers, is_not_modified, make_etag
+
+
+def make_request(headers: dict) -> Request:
+    return Request(
+        {
+            "type": "http",
+            "headers": [(k.lower().encode(), v.encode()) for k, v in headers.items()],
+        }
+    )
+
+
+def test_matching_etag_is_not_modified():
+    etag = make_etag("tags", 3, datetime(2025, 1, 1))
+
+    assert not is_not_modified(make_request({}), etag)
+    assert is_not_modified(make_request({"If-None-Match": f'"other", {etag}'}), etag)
+    assert not is_not_modified(
+        make_request({"If-None-Match": make_etag("tags", 4)}), etag
+    )
+
+
+def test_if_modified_since_uses_whole_seconds():
+    updated_at = datetime(2025, 1, 1, 12, 0, 0, 500000)
+    last_modified = cache_headers('W/"x"', updated_at)["Last-Modified"]
+
+    assert last_modified == "Wed, 01 Jan 2025 12:00:00 GMT"
+    assert is_not_modified(
+        make_request({"If-Modified-Since": last_modified}), 'W/"x"', updated_at
+    )
+    assert not is_not_modified(
+        make_request({"If-Modified-Since": last_modified}),
+        'W/"x"',
+        datetime(2025, 1, 1, 12, 0, 1),
+    )
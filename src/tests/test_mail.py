@@ -0,0 +1,133 @@
+from src.mail import SMTPPool, build_message
+import fakeredis
+import pytest
+import smtplib
+
+
+class FakeSMTP:
+    def __init__(self):
+        self.sent = []
+        self.connected = True
+        # subject -> error the server answers with
+        self.refuse = {}
+
+    def send_message(self, message):
+        if not self.connected:
+            raise smtplib.SMTPServerDisconnected()
+        if message["Subject"] in self.refuse:
+            raise self.refuse[message["Subject"]]
+        self.sent.append(message["Subject"])
+
+    def noop(self):
+        if not self.connected:
+            raise smtplib.SMTPServerDisconnected()
+        return (250, b"OK")
+
+    def quit(self):
+        self.connected = False
+
+    def close(self):
+        self.connected = False
+
+
+def make_pool(keepalive=30):
+    pool = SMTPPool(size=1, keepalive=keepalive, timeout=1)
+    pool.opened = []
+
+    def connect():
+        pool.connects += 1
+        pool.opened.append(FakeSMTP())
+        return pool.opened[-1]
+
+    pool.connect = connect
+    return pool
+
+
+def test_batches_reuse_one_connection():
+    pool = make_pool()
+
+    pool.send([build_message(["a@x.com"], "one", "<p>1</p>")])
+    pool.send([build_message(["b@x.com"], f"m{i}", "<p></p>") for i in range(3)])
+
+    assert pool.connects == 1
+    assert pool.opened[0].sent == ["one", "m0", "m1", "m2"]
+    assert pool.sent == 4
+
+
+def test_dropped_connection_is_replaced():
+    pool = make_pool(keepalive=0)
+    pool.send([build_message(["a@x.com"], "one", "<p>1</p>")])
+
+    pool.opened[0].connected = False
+    pool.send([build_message(["a@x.com"], "two", "<p>2</p>")])
+
+    assert pool.connects == 2
+    assert pool.opened[1].sent == ["two"]
+
+
+def test_permanent_refusal_skips_only_that_message():
+    pool = make_pool()
+    pool.send([build_message(["a@x.com"], "one", "<p>1</p>")])
+    pool.opened[0].refuse["m1"] = smtplib.SMTPRecipientsRefused(
+        {"bad@x.com": (550, b"no such user")}
+    )
+    rejected = []
+
+    pool.send(
+        [build_message(["b@x.com"], f"m{i}", "<p></p>") for i in range(3)],
+        on_rejected=lambda i, exc: rejected.append(i),
+    )
+
+    assert rejected == [1]
+    assert pool.opened[0].sent == ["one", "m0", "m2"]
+    assert pool.connects == 1
+
+
+def test_temporary_refusal_raises_and_keeps_the_connection():
+    pool = make_pool()
+    pool.send([build_message(["a@x.com"], "one", "<p>1</p>")])
+    pool.opened[0].refuse["two"] = smtplib.SMTPDataError(451, b"try later")
+
+    with pytest.raises(smtplib.SMTPDataError):
+        pool.send(
+            [build_message(["a@x.com"], "two", "<p>2</p>")],
+            on_rejected=lambda i, exc: None,
+        )
+
+    assert pool.opened[0].connected
+    assert [smtp for smtp, _ in pool.idle] == [pool.opened[0]]
+
+
+def test_bulk_mail_is_chunked_onto_its_own_queue():
+    from src.celery_tasks import c_app, chunked, send_email, send_email_chunk
+
+    assert chunked(["a", "b", "c", "d", "e"], 2) == [["a", "b"], ["c", "d"], ["e"]]
+
+    route = c_app.amqp.router.route
+    assert route({}, send_email.name)["queue"].name == "transactional"
+    assert route({}, send_email_chunk.name)["queue"].name == "bulk"
+
+
+def test_retried_chunk_skips_recipients_already_sent(monkeypatch):
+    from src import celery_tasks
+
+    delivered = []
+
+    def smtp_send(messages, on_sent, on_rejected):
+        for i, message in enumerate(messages):
+            if message["To"] == "c@x.com" and len(delivered) < 3:
+                raise smtplib.SMTPServerDisconnected()
+            delivered.append(message["To"])
+            on_sent(i)
+        return 1.0
+
+    monkeypatch.setattr(celery_tasks, "sent_emails", fakeredis.FakeRedis())
+    monkeypatch.setattr(celery_tasks.smtp_pool, "send", smtp_send)
+    chunk = (["a@x.com", "b@x.com", "c@x.com"], "s", "b", "job-1")
+
+    with pytest.raises(smtplib.SMTPServerDisconnected):
+        celery_tasks.send_email_chunk.run(*chunk)
+    delivered.append("retry")
+    celery_tasks.send_email_chunk.run(*chunk)
+
+    assert delivered == ["a@x.com", "b@x.com", "retry", "c@x.com"]
@@ -0,0 +1,38 @@
+from prometheus_client import CollectorRegistry, generate_latest
+from sqlalchemy import create_engine, text
+from src.metrics import (
+    RequestQueries,
+    StatsCollector,
+    instrument_engine,
+    request_queries,
+)
+
+
+def test_stats_collector_exports_numbers_only():
+    collector = StatsCollector()
+    collector.add("pool", lambda: {"size": 5, "names": {"a": 1}, "rebuilt_at": None})
+    registry = CollectorRegistry()
+    registry.register(collector)
+
+    body = generate_latest(registry).decode()
+
+    assert "bookly_pool_size 5.0" in body
+    assert "names" not in body
+    assert "rebuilt_at" not in body
+
+
+def test_queries_are_counted_per_request():
+    engine = create_engine("sqlite://")
+    instrument_engine(engine)
+    queries = RequestQueries()
+    token = request_queries.set(queries)
+
+    try:
+        with engine.connect() as conn:
+            conn.execute(text("select 1"))
+            conn.execute(text("select 2"))
+    finally:
+        request_queries.reset(token)
+
+    assert queries.count == 2
+    assert queries.seconds > 0
@@ -0,0 +1,128 @@
+from celery.exceptions import Retry
+from src import celery_tasks, outbox
+from src.outbox import OutboxDispatcher
+from unittest.mock import Mock
+import pytest
+import redis
+import smtplib
+import uuid
+
+
+def test_publish_sends_the_batch_as_one_task(monkeypatch):
+    delay = Mock(side_effect=[None, ConnectionError("broker down")])
+    monkeypatch.setattr(outbox.send_emails, "delay", delay)
+    dispatcher = OutboxDispatcher(batch_size=10, poll_seconds=1, max_backoff=60)
+    uids = [uuid.uuid4() for _ in range(3)]
+    emails = [(uid, ["a@x.com"], "s", "b") for uid in uids]
+
+    assert dispatcher.publish(emails) is None
+    assert delay.call_args.args[0] == [
+        (["a@x.com"], "s", "b", str(uid)) for uid in uids
+    ]
+    assert "broker down" in dispatcher.publish(emails)
+
+
+def sent_once(messages, on_sent, on_rejected):
+    for i in range(len(messages)):
+        on_sent(i)
+    return 1.0
+
+
+def test_failed_batch_releases_only_unsent_emails(monkeypatch):
+    sent_emails = Mock()
+    sent_emails.exists.return_value = False
+    sent_emails.set.return_value = True
+
+    def smtp_send(messages, on_sent, on_rejected):
+        on_sent(0)
+        raise smtplib.SMTPServerDisconnected("gone")
+
+    monkeypatch.setattr(celery_tasks, "sent_emails", sent_emails)
+    monkeypatch.setattr(celery_tasks.smtp_pool, "send", smtp_send)
+
+    with pytest.raises(smtplib.SMTPServerDisconnected):
+        celery_tasks.send_emails.run(
+            [(["a@x.com"], "s", "b", "row-1"), (["b@x.com"], "s", "b", "row-2")]
+        )
+
+    sent_emails.pipeline().set.assert_called_once_with(
+        "email_sent:row-1", 1, ex=celery_tasks.SENT_EMAIL_TTL
+    )
+    sent_emails.delete.assert_called_once_with("email_sending:row-2")
+
+
+def test_outbox_email_is_sent_once(monkeypatch):
+    sent_emails = Mock()
+    sent_emails.exists.side_effect = [False, True]
+    sent_emails.set.return_value = True
+    smtp_send = Mock(side_effect=sent_once)
+    monkeypatch.setattr(celery_tasks, "sent_emails", sent_emails)
+    monkeypatch.setattr(celery_tasks.smtp_pool, "send", smtp_send)
+
+    celery_tasks.send_email.run(["a@x.com"], "s", "b", dedup_key="row-1")
+    celery_tasks.send_email.run(["a@x.com"], "s", "b", dedup_key="row-1")
+
+    assert smtp_send.call_count == 1
+    # only locked while sending, marked sent once the server accepted it
+    sent_emails.set.assert_called_once_with(
+        "email_sending:row-1", 1, nx=True, ex=celery_tasks.SENDING_LOCK_TTL
+    )
+    pipeline = sent_emails.pipeline.return_value
+    pipeline.set.return_value.delete.assert_called_once_with("email_sending:row-1")
+
+
+def test_email_being_sent_elsewhere_is_retried(monkeypatch):
+    sent_emails = Mock()
+    sent_emails.exists.return_value = False
+    sent_emails.set.side_effect = [True, None]
+    smtp_send = Mock(side_effect=sent_once)
+    monkeypatch.setattr(celery_tasks, "sent_emails", sent_emails)
+    monkeypatch.setattr(celery_tasks.smtp_pool, "send", smtp_send)
+
+    with pytest.raises(Retry):
+        celery_tasks.send_emails.run(
+            [(["a@x.com"], "s", "b", "row-1"), (["b@x.com"], "s", "b", "row-2")]
+        )
+
+    assert len(smtp_send.call_args.args[0]) == 1
+
+
+def test_rejected_email_does_not_block_the_batch(monkeypatch):
+    sent_emails = Mock()
+    sent_emails.exists.return_value = False
+    sent_emails.set.return_value = True
+
+    def smtp_send(messages, on_sent, on_rejected):
+        on_rejected(0, smtplib.SMTPRecipientsRefused({"a@x.com": (550, b"no")}))
+        on_sent(1)
+        return 1.0
+
+    monkeypatch.setattr(celery_tasks, "sent_emails", sent_emails)
+    monkeypatch.setattr(celery_tasks.smtp_pool, "send", smtp_send)
+
+    celery_tasks.send_emails.run(
+        [(["a@x.com"], "s", "b", "row-1"), (["b@x.com"], "s", "b", "row-2")]
+    )
+
+    # both are marked so a redelivered batch doesn't try the refused one again
+    pipeline = sent_emails.pipeline.return_value
+    assert [c.args[0] for c in pipeline.set.call_args_list] == [
+        "email_sent:row-1",
+        "email_sent:row-2",
+    ]
+
+
+def test_redis_outage_keeps_sending_and_the_smtp_error(monkeypatch):
+    sent_emails = Mock()
+    for method in (sent_emails.exists, sent_emails.delete, sent_emails.pipeline):
+        method.side_effect = redis.ConnectionError("redis down")
+    smtp_send = Mock(side_effect=sent_once)
+    monkeypatch.setattr(celery_tasks, "sent_emails", sent_emails)
+    monkeypatch.setattr(celery_tasks.smtp_pool, "send", smtp_send)
+
+    celery_tasks.send_email.run(["a@x.com"], "s", "b", dedup_key="row-1")
+    assert smtp_send.call_count == 1
+
+    smtp_send.side_effect = smtplib.SMTPServerDisconnected("gone")
+    with pytest.raises(smtplib.SMTPServerDisconnected):
+        celery_tasks.send_email.run(["a@x.com"], "s", "b", dedup_key="row-1")
@@ -0,0 +1,57 @@
+from fastapi.requests import Request
+from src.db import query_budget
+from src.db.query_budget import (
+    QueryBudget,
+    QueryBudgetExceeded,
+    check_request_queries,
+    normalize_sql,
+)
+from src.metrics import RequestQueries
+import pytest
+
+TAG_SELECT = "SELECT tags.uid FROM tags WHERE tags.book_uid IN ($1::UUID, $2::UUID)"
+
+
+def make_queries(statements: dict) -> RequestQueries:
+    queries = RequestQueries(track_statements=True)
+    queries.statements.update(statements)
+    queries.count = sum(statements.values())
+    return queries
+
+
+def make_request() -> Request:
+    return Request({"type": "http", "method": "GET", "headers": []})
+
+
+def test_normalize_sql_drops_parameters_and_list_lengths():
+    assert normalize_sql(TAG_SELECT) == normalize_sql(
+        "SELECT tags.uid  FROM tags\nWHERE tags.book_uid IN ($1::UUID)"
+    )
+    assert normalize_sql("SELECT 1 WHERE name = 'x'") == "SELECT ? WHERE name = ?"
+
+
+def test_repeated_statement_is_flagged(monkeypatch):
+    monkeypatch.setattr(query_budget.Config, "QUERY_BUDGET_ACTION", "raise")
+    monkeypatch.setattr(query_budget.Config, "QUERY_REPEAT_THRESHOLD", 3)
+    queries = make_queries(
+        {
+            "SELECT tags.uid FROM tags WHERE tags.uid = $1::UUID": 2,
+            "SELECT tags.uid FROM tags WHERE tags.uid = $2::UUID": 1,
+        }
+    )
+
+    with pytest.raises(QueryBudgetExceeded, match="possible N\\+1"):
+        check_request_queries(make_request(), "/tags/", queries)
+
+
+def test_budget_is_enforced_only_when_exceeded(monkeypatch):
+    monkeypatch.setattr(query_budget.Config, "QUERY_BUDGET_ACTION", "raise")
+    request = make_request()
+    QueryBudget(2)(request)
+
+    check_request_queries(request, "/books/", make_queries({TAG_SELECT: 1, "A": 1}))
+
+    with pytest.raises(QueryBudgetExceeded, match="3 statements over a budget of 2"):
+        check_request_queries(
+            request, "/books/", make_queries({TAG_SELECT: 1, "A": 1, "B": 1})
+        )
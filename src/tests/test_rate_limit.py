@@ -0,0 +1,62 @@
+from fastapi.requests import Request
+from src import rate_limit
+from src.errors import RateLimited
+from src.rate_limit import RateLimiter
+import asyncio
+import pytest
+
+
+def make_request(method: str = "POST") -> Request:
+    return Request(
+        {
+            "type": "http",
+            "method": method,
+            "path": "/api/v1/books/",
+            "headers": [],
+            "client": ("10.0.0.1", 1234),
+        }
+    )
+
+
+def test_leased_tokens_are_spent_locally(monkeypatch):
+    calls = []
+
+    async def token_bucket(keys, args):
+        calls.append(keys[0])
+        return [3, "0"]
+
+    monkeypatch.setattr(rate_limit, "token_bucket", token_bucket)
+    limiter = RateLimiter("write", per_minute=60, burst=10, lease=3)
+
+    for _ in range(6):
+        asyncio.run(limiter(make_request()))
+
+    assert calls == ["rate_limit:write:POST /api/v1/books/:ip:10.0.0.1"] * 2
+
+
+def test_denial_is_cached_with_retry_after(monkeypatch):
+    calls = []
+
+    async def token_bucket(keys, args):
+        calls.append(keys[0])
+        return [0, "2.5"]
+
+    monkeypatch.setattr(rate_limit, "token_bucket", token_bucket)
+    limiter = RateLimiter("auth", per_minute=10, burst=5)
+
+    for _ in range(2):
+        with pytest.raises(RateLimited) as exc_info:
+            asyncio.run(limiter(make_request()))
+
+    assert exc_info.value.headers["Retry-After"] in {"2", "3"}
+    assert len(calls) == 1
+
+
+def test_unlisted_methods_are_not_counted(monkeypatch):
+    async def token_bucket(keys, args):
+        raise AssertionError("reads must not reach Redis")
+
+    monkeypatch.setattr(rate_limit, "token_bucket", token_bucket)
+    limiter = RateLimiter("write", per_minute=60, burst=10, methods={"POST"})
+
+    asyncio.run(limiter(make_request("GET")))
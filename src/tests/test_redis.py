@@ -0,0 +1,62 @@
+from src.db import redis
+from redis.exceptions import ConnectionError as RedisConnectionError
+from src.db.redis import BlocklistMirror
+import asyncio
+import pytest
+import time
+
+
+def test_mirror_forgets_expired_jtis():
+    mirror = BlocklistMirror(redis=None)
+    mirror.add("revoked", time.time() + 60)
+    mirror.add("expired", time.time() - 1)
+
+    assert "revoked" in mirror
+    assert "expired" not in mirror
+    assert "unknown" not in mirror
+
+
+def test_warm_mirror_answers_without_redis(monkeypatch):
+    mirror = BlocklistMirror(redis=None)
+    mirror.add("revoked", time.time() + 60)
+    mirror.warm = True
+
+    monkeypatch.setattr(redis, "blocklist_mirror", mirror)
+    monkeypatch.setattr(redis, "token_block_list", None)
+
+    assert asyncio.run(redis.token_in_blocklist("revoked"))
+    assert not asyncio.run(redis.token_in_blocklist("unknown"))
+
+
+class FakePubSub:
+    def __init__(self, messages):
+        self.messages = list(messages)
+        self.pings = 0
+
+    async def get_message(self, timeout):
+        if self.messages:
+            return self.messages.pop(0)
+        await asyncio.sleep(timeout)
+        return None
+
+    async def ping(self):
+        self.pings += 1
+
+
+def test_mirror_skips_malformed_messages_and_drops_silent_connections(monkeypatch):
+    monkeypatch.setattr(redis, "MIRROR_PING_INTERVAL", 0.01)
+    mirror = BlocklistMirror(redis=None)
+    expires_at = time.time() + 60
+    pubsub = FakePubSub(
+        [
+            {"type": "message", "data": b"\xff\xfe"},
+            {"type": "message", "data": b"no-expiry"},
+            {"type": "message", "data": f"revoked:{expires_at}".encode()},
+        ]
+    )
+
+    with pytest.raises(RedisConnectionError):
+        asyncio.run(mirror._listen(pubsub))
+
+    assert "revoked" in mirror
+    assert pubsub.pings >= 1
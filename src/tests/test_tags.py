@@ -0,0 +1,15 @@
+from sqlalchemy.exc import IntegrityError
+from src.errors import TagAlreadyExists
+from src.tags.service import TagService
+from unittest.mock import AsyncMock
+import asyncio
+import pytest
+
+
+def test_duplicate_name_on_commit_is_tag_already_exists():
+    session = AsyncMock()
+    session.commit.side_effect = IntegrityError("INSERT", {}, Exception("ix_tags_name"))
+
+    with pytest.raises(TagAlreadyExists):
+        asyncio.run(TagService().commit_tag(session))
+    session.rollback.assert_awaited_once()